@@ -0,0 +1,42 @@
+import numpy as np
+from typing import Sequence, Tuple
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional - without it the fill runs as plain NumPy slicing
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+# Not parallel=True: numba's thread pool doesn't survive the fork() that
+# process pools (and the test suite) use after a first call
+@njit(cache=True)
+def _fill_boxes(arr, bboxes, color):
+    """
+    Fill boxes of an image array with a solid color
+
+    Args:
+        arr: uint8 array of shape (height, width, channels), modified in place
+        bboxes: int32 array of shape (n, 4) holding clipped, half-open
+            (x0, y0, x1, y1) boxes
+        color: uint8 array of shape (channels,)
+    """
+    for i in range(bboxes.shape[0]):
+        arr[bboxes[i, 1]:bboxes[i, 3], bboxes[i, 0]:bboxes[i, 2]] = color
+
+
+def to_bbox_array(boxes: Sequence[Tuple], width: int, height: int) -> np.ndarray:
+    """
+    Pack inclusive (x0, y0, x1, y1) boxes, as ImageDraw.rectangle takes them,
+    into a clipped half-open int32 array for _fill_boxes
+    """
+    # Float coordinates truncate, as they do in ImageDraw
+    out = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).astype(np.int32)
+    # ImageDraw.rectangle includes the far edge; slicing doesn't
+    out[:, [2, 3]] += 1
+    out[:, [0, 2]] = np.clip(out[:, [0, 2]], 0, width)
+    out[:, [1, 3]] = np.clip(out[:, [1, 3]], 0, height)
+    return out
@@ -0,0 +1,81 @@
+import numpy as np
+from typing import List, Tuple
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional - without it the scanner runs as plain Python
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+# NNN-NN-NNNN
+SSN_WIDTH = 11
+
+
+@njit(cache=True)
+def _is_word_byte(b) -> bool:
+    """ASCII alnum or underscore; non-ASCII bytes are left to scan_ssn_text"""
+    return (48 <= b <= 57) or (65 <= b <= 90) or (97 <= b <= 122) or b == 95
+
+
+@njit(cache=True)
+def scan_ssn(buf) -> List[Tuple[int, int]]:
+    """
+    Find SSNs in a UTF-8 byte buffer, like r'\\b\\d{3}-\\d{2}-\\d{4}\\b'
+
+    Boundaries are only checked against ASCII word characters: a match
+    next to any non-ASCII character is reported, whether that character
+    is a letter or punctuation like NBSP. scan_ssn_text decodes those
+    neighbours to match re's Unicode \\b exactly.
+
+    Args:
+        buf: uint8 array, e.g. np.frombuffer(text.encode(), np.uint8)
+
+    Returns:
+        List of (start, end) byte offsets; these equal character offsets
+        only for ASCII text
+    """
+    out = []
+    n = len(buf) - (SSN_WIDTH - 1)
+    for i in range(n):
+        if (buf[i + 3] == 45 and buf[i + 6] == 45
+                and 48 <= buf[i] <= 57 and 48 <= buf[i + 1] <= 57 and 48 <= buf[i + 2] <= 57
+                and 48 <= buf[i + 4] <= 57 and 48 <= buf[i + 5] <= 57
+                and 48 <= buf[i + 7] <= 57 and 48 <= buf[i + 8] <= 57
+                and 48 <= buf[i + 9] <= 57 and 48 <= buf[i + 10] <= 57
+                and (i == 0 or not _is_word_byte(buf[i - 1]))
+                and (i + SSN_WIDTH == len(buf) or not _is_word_byte(buf[i + SSN_WIDTH]))):
+            out.append((i, i + SSN_WIDTH))
+    return out
+
+
+def _is_word_char(char: str) -> bool:
+    """What re's \\w matches in a str pattern"""
+    return char.isalnum() or char == '_'
+
+
+def scan_ssn_text(text: str) -> List[Tuple[int, int]]:
+    """
+    Find SSNs in a string, with re's Unicode \\b semantics
+
+    Returns:
+        List of (start, end) byte offsets into the UTF-8 encoding
+    """
+    data = text.encode('utf-8')
+    matches = []
+    for start, end in scan_ssn(np.frombuffer(data, dtype=np.uint8)):
+        if start > 0 and data[start - 1] >= 128:
+            # Back up to the lead byte of the character before the match
+            lead = start - 1
+            while data[lead] & 0xC0 == 0x80:
+                lead -= 1
+            if _is_word_char(data[lead:start].decode('utf-8')):
+                continue
+        if end < len(data) and data[end] >= 128:
+            # A UTF-8 character is at most 4 bytes; 'ignore' drops any cut-off tail
+            if _is_word_char(data[end:end + 4].decode('utf-8', 'ignore')[:1]):
+                continue
+        matches.append((start, end))
+    return matches
@@ -111,7 +111,7 @@ class OCRService:
             doc = fitz.open(pdf_path)
             pages_data = []
             
-            for page_num in range(len(doc)):
+            for page_num in range(doc.page_count):
                 try:
                     page = doc.load_page(page_num)
                     
@@ -183,7 +183,7 @@ class OCRService:
                         'error': str(page_error)
                     })
             
-            total_pages = len(doc)
+            total_pages = doc.page_count
             
             return {
                 'pages': pages_data,
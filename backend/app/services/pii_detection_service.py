@@ -1,5 +1,8 @@
 import spacy
+import os
 import re
+import uuid
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
 import logging
@@ -9,19 +12,59 @@ logger = logging.getLogger(__name__)
 class PIIDetectionService:
     """Service for detecting personally identifiable information in text"""
     
-    def __init__(self, spacy_model: str = "en_core_web_sm"):
+    # Only the NER component is used (see _detect_with_spacy), so minimal_pipeline
+    # can leave out the rest. The parser listens to the shared tok2vec layer, so
+    # it has to be excluded along with it.
+    UNUSED_SPACY_PIPES = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+    
+    # Regex patterns, compiled once at import and shared by every instance
+    EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+    PHONE_PATTERNS = (
+        (re.compile(r'\d{3}-\d{3}-\d{4}'), '123-456-7890'),
+        (re.compile(r'\(\d{3}\)\s*\d{3}-\d{4}'), '(123) 456-7890'),
+        (re.compile(r'\d{3}\.\d{3}\.\d{4}'), '123.456.7890'),
+        (re.compile(r'\+1\s*\d{3}\s*\d{3}\s*\d{4}'), '+1 123 456 7890'),
+    )
+    SSN_RE = re.compile(r'\b\d{3}-\d{2}-\d{4}\b')
+    CREDIT_CARD_RE = re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b')
+    INDIAN_DATE_RE = re.compile(r'\b(0[1-9]|[12]\d|3[01])-(0[1-9]|1[0-2])-(\d{4})\b')
+    STUDENT_ID_RE = re.compile(r'\b\d{4}[A-Z]{2,3}\d{6}\b')
+    TRANSACTION_ID_RE = re.compile(r'\b\d{15,}\b')
+    
+    # Patterns that indicate labels/headers (text followed by colon/equals)
+    LABEL_PATTERNS = (
+        re.compile(r'^\w+\s+no:?$'),  # "Student No" / "Roll No:"
+        re.compile(r'^\w+\s+name:?$'),  # "Student Name:"
+        re.compile(r'^[\w\s]+:$'),  # Any text ending with colon
+    )
+    WRITTEN_AMOUNT_RE = re.compile(r'^[a-zA-Z\s]+[Rr]upees?$')
+    TIME_RE = re.compile(r'^\d{1,2}:\d{2}(:\d{2})?')
+    
+    # Results of detect_pii kept per instance when PII_DETECT_CACHE=1
+    DETECT_CACHE_SIZE = 128
+    
+    def __init__(self, spacy_model: str = "en_core_web_sm", minimal_pipeline: bool = False,
+                 detect_cache: Optional[bool] = None, warmup: bool = True):
         self.spacy_model_name = spacy_model
+        self.minimal_pipeline = minimal_pipeline
         self.nlp = None
         self.hf_pipeline = None
+        if detect_cache is None:
+            detect_cache = os.getenv("PII_DETECT_CACHE", "0") == "1"
+        # Per instance, so the cache never outlives (or pins) its service
+        self._detect_cached = lru_cache(maxsize=self.DETECT_CACHE_SIZE)(self._detect_frozen) if detect_cache else None
         self._load_models()
+        if warmup:
+            self._warmup()
     
     def _load_models(self):
         """Load NLP models"""
         try:
             # Try to load spaCy model
             try:
-                self.nlp = spacy.load(self.spacy_model_name)
-                logger.info(f"Loaded spaCy model: {self.spacy_model_name}")
+                exclude = self.UNUSED_SPACY_PIPES if self.minimal_pipeline else []
+                self.nlp = spacy.load(self.spacy_model_name, exclude=exclude)
+                logger.info(f"Loaded spaCy model: {self.spacy_model_name} (pipes: {self.nlp.pipe_names})")
             except OSError as e:
                 logger.warning(f"Could not load spaCy model {self.spacy_model_name}: {e}")
                 logger.info("Falling back to regex-only PII detection")
@@ -43,15 +86,40 @@ class PIIDetectionService:
             logger.error(f"Error loading models: {e}")
             # Continue with regex-only detection
     
+    def _warmup(self):
+        """Run spaCy once so op initialization and buffer allocation happen here, not on the first real text"""
+        if self.nlp:
+            self.nlp("a b c")
+            logger.debug("[SpaCy NER] Pipeline warmed up")
+    
     def detect_pii(self, text: str, confidence_threshold: float = 0.85) -> List[Dict]:
         """Detect PII entities in text"""
-        import uuid
+        if self._detect_cached is None:
+            return self._detect_pii(text, confidence_threshold)
         
+        # Cached entities are shared; hand out copies with fresh ids so callers
+        # can mutate and store them as if freshly detected
+        return [dict(entity, id=str(uuid.uuid4())) for entity in self._detect_cached(text, confidence_threshold)]
+    
+    def _detect_frozen(self, text: str, confidence_threshold: float) -> Tuple[Dict, ...]:
+        return tuple(self._detect_pii(text, confidence_threshold))
+    
+    def detect_pii_batch(self, texts: List[str], confidence_threshold: float = 0.85, batch_size: int = 32) -> List[List[Dict]]:
+        """Detect PII entities in several texts, running spaCy over them in batches"""
+        if self.nlp:
+            docs = self.nlp.pipe(texts, batch_size=batch_size)
+        else:
+            docs = [None] * len(texts)
+        
+        return [self._detect_pii(text, confidence_threshold, doc) for text, doc in zip(texts, docs)]
+    
+    def _detect_pii(self, text: str, confidence_threshold: float, doc=None) -> List[Dict]:
+        """Run all detection methods on text, reusing an already-parsed spaCy doc if given"""
         entities = []
         
         # SpaCy NER
         if self.nlp:
-            spacy_entities = self._detect_with_spacy(text, confidence_threshold)
+            spacy_entities = self._detect_with_spacy(text, confidence_threshold, doc)
             entities.extend(spacy_entities)
             logger.info(f"[SpaCy NER] Detected {len(spacy_entities)} entities")
             if spacy_entities:
@@ -113,10 +181,11 @@ class PIIDetectionService:
         
         return entities
     
-    def _detect_with_spacy(self, text: str, confidence_threshold: float) -> List[Dict]:
+    def _detect_with_spacy(self, text: str, confidence_threshold: float, doc=None) -> List[Dict]:
         """Detect entities using spaCy NER"""
         entities = []
-        doc = self.nlp(text)
+        if doc is None:
+            doc = self.nlp(text)
         
         for ent in doc.ents:
             # Map spaCy labels to our PII types
@@ -172,13 +241,6 @@ class PIIDetectionService:
             # NOTE: Removed 'ssn', 'phone', 'email' from skip list as these are legitimate PII
         }
         
-        # Patterns that indicate labels/headers (text followed by colon/equals)
-        label_patterns = [
-            r'^\w+\s+no:?$',  # "Student No" / "Roll No:"
-            r'^\w+\s+name:?$',  # "Student Name:"
-            r'^[\w\s]+:$',  # Any text ending with colon
-        ]
-        
         filtered = []
         filtered_count = 0
         
@@ -194,9 +256,9 @@ class PIIDetectionService:
             
             # Check for label patterns
             is_label = False
-            for pattern in label_patterns:
-                if re.match(pattern, entity_text_lower):
-                    logger.debug(f"[Filter] Skipped label pattern: '{entity['text']}' (matches {pattern})")
+            for pattern in self.LABEL_PATTERNS:
+                if pattern.match(entity_text_lower):
+                    logger.debug(f"[Filter] Skipped label pattern: '{entity['text']}' (matches {pattern.pattern})")
                     filtered_count += 1
                     is_label = True
                     break
@@ -228,13 +290,13 @@ class PIIDetectionService:
                     continue
             
             # Filter out written amounts (e.g., "Three Hundred and Fifty Four Rupees")
-            if entity['label'] == 'IDENTIFIER' and re.match(r'^[a-zA-Z\s]+[Rr]upees?$', entity_text):
+            if entity['label'] == 'IDENTIFIER' and self.WRITTEN_AMOUNT_RE.match(entity_text):
                 logger.debug(f"[Filter] Skipped written amount: '{entity['text']}'")
                 filtered_count += 1
                 continue
             
             # Filter out time expressions that are not actual times
-            if entity['label'] == 'TIME' and not re.match(r'^\d{1,2}:\d{2}(:\d{2})?', entity_text):
+            if entity['label'] == 'TIME' and not self.TIME_RE.match(entity_text):
                 logger.debug(f"[Filter] Skipped non-time pattern: '{entity['text']}'")
                 filtered_count += 1
                 continue
@@ -253,8 +315,7 @@ class PIIDetectionService:
                        'INDIAN_DATE': 0, 'STUDENT_ID': 0, 'TRANSACTION_ID': 0}
         
         # Email pattern
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        for match in re.finditer(email_pattern, text):
+        for match in self.EMAIL_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'EMAIL',
@@ -268,15 +329,8 @@ class PIIDetectionService:
             logger.debug(f"[Regex] EMAIL pattern matched: '{match.group()}' at position {match.start()}")
         
         # Phone number patterns
-        phone_patterns = [
-            (r'\d{3}-\d{3}-\d{4}', '123-456-7890'),
-            (r'\(\d{3}\)\s*\d{3}-\d{4}', '(123) 456-7890'),
-            (r'\d{3}\.\d{3}\.\d{4}', '123.456.7890'),
-            (r'\+1\s*\d{3}\s*\d{3}\s*\d{4}', '+1 123 456 7890'),
-        ]
-        
-        for pattern, pattern_desc in phone_patterns:
-            for match in re.finditer(pattern, text):
+        for pattern, pattern_desc in self.PHONE_PATTERNS:
+            for match in pattern.finditer(text):
                 entity_obj = {
                     'text': match.group(),
                     'label': 'PHONE',
@@ -290,8 +344,7 @@ class PIIDetectionService:
                 logger.debug(f"[Regex] PHONE pattern ({pattern_desc}) matched: '{match.group()}' at position {match.start()}")
         
         # SSN pattern
-        ssn_pattern = r'\b\d{3}-\d{2}-\d{4}\b'
-        for match in re.finditer(ssn_pattern, text):
+        for match in self.SSN_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'SSN',
@@ -305,8 +358,7 @@ class PIIDetectionService:
             logger.debug(f"[Regex] SSN pattern matched: '{match.group()}' at position {match.start()}")
         
         # Credit card pattern (simplified)
-        cc_pattern = r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b'
-        for match in re.finditer(cc_pattern, text):
+        for match in self.CREDIT_CARD_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'CREDIT_CARD',
@@ -320,8 +372,7 @@ class PIIDetectionService:
             logger.debug(f"[Regex] CREDIT_CARD pattern matched: '{match.group()}' at position {match.start()}")
         
         # Indian date format (DD-MM-YYYY) - NEW
-        indian_date_pattern = r'\b(0[1-9]|[12]\d|3[01])-(0[1-9]|1[0-2])-(\d{4})\b'
-        for match in re.finditer(indian_date_pattern, text):
+        for match in self.INDIAN_DATE_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'DATE',
@@ -335,8 +386,7 @@ class PIIDetectionService:
             logger.debug(f"[Regex] INDIAN_DATE (DD-MM-YYYY) pattern matched: '{match.group()}' at position {match.start()}")
         
         # Student ID / College ID (0801CS221155) - NEW
-        student_id_pattern = r'\b\d{4}[A-Z]{2,3}\d{6}\b'
-        for match in re.finditer(student_id_pattern, text):
+        for match in self.STUDENT_ID_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'STUDENT_ID',
@@ -350,8 +400,7 @@ class PIIDetectionService:
             logger.debug(f"[Regex] STUDENT_ID pattern matched: '{match.group()}' at position {match.start()}")
         
         # Transaction ID (long numeric sequence 15+ digits) - NEW
-        transaction_pattern = r'\b\d{15,}\b'
-        for match in re.finditer(transaction_pattern, text):
+        for match in self.TRANSACTION_ID_RE.finditer(text):
             entity_obj = {
                 'text': match.group(),
                 'label': 'TRANSACTION_ID',
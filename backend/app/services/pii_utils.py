@@ -0,0 +1,10 @@
+from collections import defaultdict
+from typing import Dict, List
+
+
+def group_by_label(entities: List[Dict]) -> Dict[str, List[Dict]]:
+    """Group entities by label in a single pass (missing labels map to an empty list)"""
+    groups = defaultdict(list)
+    for entity in entities:
+        groups[entity.get('label')].append(entity)
+    return groups
@@ -1,19 +1,131 @@
 import fitz  # PyMuPDF
-from PIL import Image, ImageDraw, ImageFilter
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
 import io
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import logging
 from pathlib import Path
 import shutil
 
+from app.services.fast_boxes import _fill_boxes, to_bbox_array
+
 logger = logging.getLogger(__name__)
 
+
+def _bbox_coords(bbox) -> Optional[Tuple]:
+    """Normalize a {'x','y','width','height'} dict or [x0, y0, x1, y1] list to a tuple"""
+    if isinstance(bbox, dict):
+        return (bbox['x'], bbox['y'], bbox['x'] + bbox['width'], bbox['y'] + bbox['height'])
+    if isinstance(bbox, list) and len(bbox) == 4:
+        return tuple(bbox)
+    return None
+
+
+def _dedupe_overlaps(entities: List[Dict]) -> List[Dict]:
+    """
+    Drop image entities whose redaction is already covered by another entity
+    
+    Boxed entities are swept in (page, y0, x0, -area) order, and a box lying
+    inside an earlier kept box on the same page is dropped. Text-only
+    entities are redacted by searching for their text, so repeats of the
+    same text on the same page are dropped. Entities without usable text or
+    a valid bbox are kept so they're still reported as failed. The survivors
+    keep their original order.
+    """
+    keep = set()
+    seen_texts = set()
+    boxes = []
+    for idx, entity in enumerate(entities):
+        bbox = entity.get('bbox')
+        if bbox:
+            try:
+                coords = _bbox_coords(bbox)
+            except (KeyError, TypeError):
+                coords = None
+            if coords is not None:
+                x0, y0, x1, y1 = coords
+                boxes.append((entity.get('page') or 0, y0, x0, -(x1 - x0) * (y1 - y0), x1, y1, idx))
+                continue
+            keep.add(idx)
+            continue
+        
+        key = (entity.get('page') or 0, (entity.get('text') or '').strip())
+        if key[1] and key in seen_texts:
+            continue
+        seen_texts.add(key)
+        keep.add(idx)
+    
+    boxes.sort()
+    active = []
+    active_page = None
+    for page, y0, x0, _, x1, y1, idx in boxes:
+        if page != active_page:
+            active, active_page = [], page
+        # Boxes that end above this one can't contain it or anything after it
+        active = [box for box in active if box[3] >= y0]
+        if any(ax0 <= x0 and ax1 >= x1 and ay1 >= y1 for ax0, _, ax1, ay1 in active):
+            continue
+        active.append((x0, y0, x1, y1))
+        keep.add(idx)
+    
+    return [entity for idx, entity in enumerate(entities) if idx in keep]
+
+
+def _dedupe_texts(entities: List[Dict]) -> List[Dict]:
+    """
+    Drop PDF entities whose text repeats an earlier entity's
+    
+    PDF redaction searches every page for each entity's text, so only an
+    identical text is redundant: a text inside a longer one ("John" in
+    "John Doe") can still occur on its own elsewhere. Entities without
+    text are kept so they're still reported as failed.
+    """
+    seen_texts = set()
+    unique = []
+    for entity in entities:
+        text = (entity.get('text') or '').strip()
+        if text:
+            if text in seen_texts:
+                continue
+            seen_texts.add(text)
+        unique.append(entity)
+    return unique
+
+
+def _dedupe_entities(entities: List[Dict], file_ext: str) -> List[Dict]:
+    """
+    Drop entities another one already covers, given how the format is redacted
+    
+    Deduplication is only an optimization: if it can't make sense of the
+    entities, all of them are redacted rather than failing the redaction.
+    """
+    try:
+        if file_ext == '.pdf':
+            return _dedupe_texts(entities)
+        return _dedupe_overlaps(entities)
+    except Exception as e:
+        logger.warning(f"[Redaction] Skipping entity deduplication: {e}")
+        return entities
+
+
 class RedactionService:
     """Service for redacting PII from documents while preserving layout"""
     
-    def __init__(self):
+    # Full cleanup for documents handed back to users: drop unused and
+    # duplicate objects, compress streams
+    DEFAULT_SAVE_OPTIONS = {'garbage': 4, 'deflate': True}
+    
+    def __init__(self, save_options: Optional[Dict] = None):
+        """
+        Args:
+            save_options: fitz.Document.save keyword arguments for redacted
+                PDFs, e.g. {'garbage': 0, 'deflate': False} to skip cleanup
+                and compression where output size doesn't matter
+        """
         self.supported_formats = {'.pdf', '.png', '.jpg', '.jpeg'}
+        self.save_options = dict(self.DEFAULT_SAVE_OPTIONS if save_options is None else save_options)
     
     def redact_document(
         self, 
@@ -34,8 +146,18 @@ class RedactionService:
             blur_radius: Blur radius for blur style
             
         Returns:
-            Dict with redaction results and statistics
+            Dict with redaction results and statistics. With no entities the
+            input is copied to output_path unchanged, without opening it.
         """
+        if not entities:
+            file_ext = Path(input_path).suffix.lower()
+            if file_ext not in self.supported_formats:
+                logger.error(f"[Redaction] Unsupported file format: {file_ext}")
+                raise ValueError(f"Unsupported file format: {file_ext}")
+            shutil.copyfile(input_path, output_path)
+            logger.info(f"[Redaction] No entities to redact, copied {input_path} unchanged")
+            return self._unredacted_result(output_path, file_ext, redaction_style)
+        
         # Log entity summary
         entity_summary = {}
         for entity in entities:
@@ -55,16 +177,23 @@ class RedactionService:
         try:
             file_ext = Path(input_path).suffix.lower()
             
+            unique_entities = _dedupe_entities(entities, file_ext)
+            if len(unique_entities) < len(entities):
+                logger.info(f"[Redaction] Dropped {len(entities) - len(unique_entities)} duplicate/overlapping entities")
+            
             if file_ext == '.pdf':
-                result = self._redact_pdf(input_path, output_path, entities, redaction_style, blur_radius)
-                logger.info(f"[Redaction] PDF redaction complete: {result['redacted_entities']}/{result['total_entities']} entities redacted")
-                return result
+                result = self._redact_pdf(input_path, output_path, unique_entities, redaction_style, blur_radius)
             elif file_ext in {'.png', '.jpg', '.jpeg'}:
-                result = self._redact_image(input_path, output_path, entities, redaction_style, blur_radius)
-                logger.info(f"[Redaction] Image redaction complete: {result['redacted_entities']}/{result['total_entities']} entities redacted")
-                return result
+                result = self._redact_image(input_path, output_path, unique_entities, redaction_style, blur_radius)
             else:
                 raise ValueError(f"Unsupported file format: {file_ext}")
+            # total_entities counts what the caller passed in, as in the error fallback
+            result['total_entities'] = len(entities)
+            result['unique_entities'] = len(unique_entities)
+            
+            logger.info(f"[Redaction] {'PDF' if file_ext == '.pdf' else 'Image'} redaction complete: "
+                        f"{result['redacted_entities']}/{result['total_entities']} entities redacted")
+            return result
                 
         except ValueError as e:
             # Unsupported format - re-raise
@@ -87,9 +216,103 @@ class RedactionService:
                 logger.error(f"[Redaction] Failed to copy original file: {copy_error}")
                 raise e
     
+    def redact_document_from_bytes(
+        self,
+        data: bytes,
+        file_ext: str,
+        output_path: str,
+        entities: List[Dict],
+        redaction_style: str = 'black',
+        blur_radius: int = 10
+    ) -> Dict:
+        """
+        Redact PII entities from an in-memory document
+        
+        Same as redact_document, but decodes the input from bytes so callers
+        that already hold the file contents skip the disk read.
+        
+        Args:
+            data: Raw document contents
+            file_ext: Format of the data, e.g. '.pdf' or '.png'
+            output_path: Path to save redacted document
+            entities: List of detected entities with bbox info
+            redaction_style: 'black', 'blur', or 'white'
+            blur_radius: Blur radius for blur style
+            
+        Returns:
+            Dict with redaction results and statistics
+        """
+        file_ext = file_ext.lower()
+        if not entities:
+            if file_ext not in self.supported_formats:
+                logger.error(f"[Redaction] Unsupported file format: {file_ext}")
+                raise ValueError(f"Unsupported file format: {file_ext}")
+            Path(output_path).write_bytes(data)
+            logger.info(f"[Redaction] No entities to redact, wrote input unchanged")
+            return self._unredacted_result(output_path, file_ext, redaction_style)
+        
+        logger.info(f"[Redaction] Starting in-memory redaction of {len(data)} bytes ({file_ext})")
+        logger.info(f"[Redaction] Total entities to redact: {len(entities)}")
+        
+        try:
+            unique_entities = _dedupe_entities(entities, file_ext)
+            
+            if file_ext == '.pdf':
+                result = self._redact_pdf(data, output_path, unique_entities, redaction_style, blur_radius)
+            elif file_ext in {'.png', '.jpg', '.jpeg'}:
+                result = self._redact_image(data, output_path, unique_entities, redaction_style, blur_radius)
+            else:
+                raise ValueError(f"Unsupported file format: {file_ext}")
+            result['total_entities'] = len(entities)
+            result['unique_entities'] = len(unique_entities)
+            
+            return result
+                
+        except ValueError as e:
+            logger.error(f"[Redaction] Unsupported file format: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"[Redaction] In-memory redaction failed: {str(e)}")
+            # Same fallback as redact_document: write the original unredacted
+            with open(output_path, 'wb') as f:
+                f.write(data)
+            logger.warning(f"[Redaction] Wrote original file without redaction due to error")
+            return {
+                'redacted_entities': 0,
+                'total_entities': len(entities),
+                'output_path': output_path,
+                'redaction_style': redaction_style,
+                'error': str(e)
+            }
+    
+    def _unredacted_result(self, output_path: str, file_ext: str, redaction_style: str) -> Dict:
+        """Result dict for a document written out with nothing to redact"""
+        result = {
+            'redacted_entities': 0,
+            'total_entities': 0,
+            'unique_entities': 0,
+            'output_path': output_path,
+            'redaction_style': redaction_style
+        }
+        if file_ext == '.pdf':
+            # Same keys as _redact_pdf's result
+            result['unique_redacted'] = 0
+        return result
+    
+    def open(self, input_path: str) -> 'RedactionContext':
+        """
+        Parse a document once for several redactions
+        
+        Usage:
+            with service.open(path) as ctx:
+                ctx.redact_to(out_black, entities, 'black')
+                ctx.redact_to(out_white, entities, 'white')
+        """
+        return RedactionContext(self, input_path)
+    
     def _redact_pdf(
         self, 
-        input_path: str, 
+        input_path: Union[str, bytes, fitz.Document], 
         output_path: str, 
         entities: List[Dict],
         redaction_style: str,
@@ -102,8 +325,8 @@ class RedactionService:
         entities_redacted = []
         
         try:
-            doc = fitz.open(input_path)
-            logger.info(f"[PDF Redaction] Opened PDF with {len(doc)} pages")
+            doc = self._open_pdf(input_path, output_path)
+            logger.info(f"[PDF Redaction] Opened PDF with {doc.page_count} pages")
             logger.info(f"[PDF Redaction] Using text-search based redaction method")
             
             # Track which entities we've already processed to avoid duplicates
@@ -111,14 +334,14 @@ class RedactionService:
             
             # Get all PDF text for context
             full_text = ""
-            for page_num in range(len(doc)):
+            for page_num in range(doc.page_count):
                 page = doc.load_page(page_num)
                 full_text += page.get_text() + "\n"
             
             # Iterate through all pages
-            for page_num in range(len(doc)):
+            for page_num in range(doc.page_count):
                 page = doc.load_page(page_num)
-                logger.debug(f"[PDF Redaction] Processing page {page_num + 1}/{len(doc)}")
+                logger.debug(f"[PDF Redaction] Processing page {page_num + 1}/{doc.page_count}")
                 
                 # Get text from page for redaction
                 for entity_idx, entity in enumerate(entities, 1):
@@ -174,7 +397,7 @@ class RedactionService:
                         entities_failed.append(entity)
             
             # Save the redacted document
-            doc.save(output_path, garbage=4, deflate=True)
+            self._save_pdf(doc, output_path)
             logger.info(f"[PDF Redaction] Saved redacted PDF to {output_path}")
             logger.info(f"[PDF Redaction] Summary: {redacted_count} entities redacted, {len(entities_failed)} failed, {len(entities_redacted)} unique entities redacted")
             
@@ -191,9 +414,21 @@ class RedactionService:
             raise
         finally:
             # Ensure document is properly closed
-            if doc is not None:
+            if doc is not None and not doc.is_closed:
                 doc.close()
     
+    def _open_pdf(self, source: Union[str, bytes, fitz.Document], output_path: str) -> fitz.Document:
+        """Open the PDF to redact from a path, raw bytes or an already parsed document"""
+        if isinstance(source, fitz.Document):
+            return source
+        if isinstance(source, bytes):
+            return fitz.open(stream=source, filetype="pdf")
+        return fitz.open(source)
+    
+    def _save_pdf(self, doc: fitz.Document, output_path: str):
+        """Write the redacted PDF as a fresh file, so no unredacted objects survive"""
+        doc.save(output_path, **self.save_options)
+    
     def _try_fuzzy_match_redaction(self, page, entity_text: str, entity: Dict, redaction_style: str) -> int:
         """Try to find and redact entity using fuzzy/partial matching"""
         redacted = 0
@@ -242,7 +477,7 @@ class RedactionService:
     
     def _redact_image(
         self, 
-        input_path: str, 
+        input_path: Union[str, bytes, Image.Image], 
         output_path: str, 
         entities: List[Dict],
         redaction_style: str,
@@ -250,10 +485,16 @@ class RedactionService:
     ) -> Dict:
         """Redact PII from image document"""
         try:
-            image = Image.open(input_path)
-            draw = ImageDraw.Draw(image)
+            if isinstance(input_path, Image.Image):
+                image = input_path
+            elif isinstance(input_path, bytes):
+                image = Image.open(io.BytesIO(input_path))
+            else:
+                image = Image.open(input_path)
             redacted_count = 0
             entities_failed = []
+            fill_boxes = []
+            blur_boxes = []
             
             logger.info(f"[Image Redaction] Opened image: {image.size}")
             logger.info(f"[Image Redaction] Total entities to redact: {len(entities)}")
@@ -266,31 +507,21 @@ class RedactionService:
                     continue
                 
                 try:
-                    # Convert bbox format
-                    if isinstance(bbox, dict):
-                        coords = (
-                            bbox['x'],
-                            bbox['y'],
-                            bbox['x'] + bbox['width'],
-                            bbox['y'] + bbox['height']
-                        )
-                    elif isinstance(bbox, list) and len(bbox) == 4:
-                        coords = tuple(bbox)
-                    else:
+                    coords = _bbox_coords(bbox)
+                    if coords is None:
                         logger.warning(f"[Image Redaction] Invalid bbox format for entity {entity_idx}")
                         entities_failed.append(entity)
                         continue
                     
                     # Apply redaction based on style
-                    if redaction_style == 'black':
-                        draw.rectangle(coords, fill='black')
-                    elif redaction_style == 'white':
-                        draw.rectangle(coords, fill='white')
+                    if redaction_style in ('black', 'white'):
+                        if coords[2] < coords[0] or coords[3] < coords[1]:
+                            raise ValueError(f"Inverted bbox {coords}")
+                        # Filled together after the loop in one array pass
+                        fill_boxes.append(coords)
                     elif redaction_style == 'blur':
-                        # For images, blur requires more complex processing
-                        region = image.crop(coords)
-                        blurred = region.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-                        image.paste(blurred, coords)
+                        # Blurred together after the loop in one whole-image pass
+                        blur_boxes.append(coords)
                     
                     logger.debug(f"[Image Redaction] Entity {entity_idx}/{len(entities)}: Redacted {entity.get('label', 'UNKNOWN')} at coords {coords}")
                     redacted_count += 1
@@ -299,6 +530,11 @@ class RedactionService:
                     logger.error(f"[Image Redaction] Failed to redact entity {entity_idx}: {e}")
                     entities_failed.append(entity)
             
+            if fill_boxes:
+                image = self._fill_regions(image, fill_boxes, 'white' if redaction_style == 'white' else 'black')
+            if blur_boxes:
+                image = self._blur_regions(image, blur_boxes, blur_radius)
+            
             # Save the redacted image
             image.save(output_path)
             logger.info(f"[Image Redaction] Saved redacted image: {redacted_count} entities redacted, {len(entities_failed)} failed")
@@ -313,6 +549,160 @@ class RedactionService:
         except Exception as e:
             logger.error(f"[Image Redaction] Image redaction failed: {str(e)}")
             raise
+    
+    def _fill_regions(self, image: Image.Image, boxes: List[Tuple], fill: str) -> Image.Image:
+        """
+        Fill the given inclusive (x0, y0, x1, y1) boxes with solid black or white
+        
+        Boxes are packed into one int32 array and filled by a compiled kernel,
+        instead of one ImageDraw call per entity. Modes without a plain 8-bit
+        channel layout fall back to ImageDraw.
+        """
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            draw = ImageDraw.Draw(image)
+            for coords in boxes:
+                draw.rectangle(coords, fill=fill)
+            return image
+        
+        arr = np.array(image)
+        pixels = arr if arr.ndim == 3 else arr[..., None]
+        value = 255 if fill == 'white' else 0
+        color = np.full(pixels.shape[2], value, dtype=np.uint8)
+        if image.mode == 'RGBA':
+            color[3] = 255
+        
+        _fill_boxes(pixels, to_bbox_array(boxes, image.width, image.height), color)
+        result = Image.fromarray(arr, mode=image.mode)
+        # Keep the ICC profile, DPI and other metadata for saving
+        result.info.update(image.info)
+        return result
+    
+    def _blur_regions(self, image: Image.Image, boxes: List[Tuple], blur_radius: int) -> Image.Image:
+        """
+        Gaussian-blur the given (x0, y0, x1, y1) boxes of an image
+        
+        Blurs one region around all the boxes with OpenCV, padded by the
+        kernel radius so box pixels come out as in a whole-image blur, and
+        copies the result back through a mask of the boxes. Palette and
+        other modes are converted to RGB(A) first, since blurring palette
+        indices is meaningless.
+        """
+        if image.mode not in ('L', 'RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        
+        arr = np.asarray(image)
+        height, width = arr.shape[:2]
+        clipped = []
+        for x0, y0, x1, y1 in boxes:
+            x0, x1 = sorted((max(0, min(width, int(x0))), max(0, min(width, int(x1)))))
+            y0, y1 = sorted((max(0, min(height, int(y0))), max(0, min(height, int(y1)))))
+            if x0 < x1 and y0 < y1:
+                clipped.append((x0, y0, x1, y1))
+        
+        if not clipped or blur_radius <= 0:
+            return image
+        
+        # OpenCV's kernel reaches at most 4 sigma from the centre
+        pad = int(np.ceil(4 * blur_radius)) + 1
+        left = max(0, min(box[0] for box in clipped) - pad)
+        top = max(0, min(box[1] for box in clipped) - pad)
+        right = min(width, max(box[2] for box in clipped) + pad)
+        bottom = min(height, max(box[3] for box in clipped) + pad)
+        
+        roi = arr[top:bottom, left:right]
+        mask = np.zeros(roi.shape[:2], dtype=bool)
+        for x0, y0, x1, y1 in clipped:
+            mask[y0 - top:y1 - top, x0 - left:x1 - left] = True
+        
+        # PIL's GaussianBlur radius is the standard deviation
+        blurred = cv2.GaussianBlur(roi, (0, 0), sigmaX=blur_radius)
+        if arr.ndim == 3:
+            mask = mask[..., None]
+        
+        out = arr.copy()
+        out[top:bottom, left:right] = np.where(mask, blurred, roi)
+        result = Image.fromarray(out, mode=image.mode)
+        # Keep the ICC profile, DPI and other metadata for saving
+        result.info.update(image.info)
+        return result
+
+
+class RedactionContext:
+    """
+    A document parsed once and redacted into any number of outputs
+    
+    Each redact_to call works on an in-memory copy of the parsed source, so
+    different styles or entity sets never see each other's marks. Unlike
+    redact_document, failures are raised rather than falling back to
+    copying the original.
+    """
+    
+    def __init__(self, service: RedactionService, input_path: str):
+        self.service = service
+        self.file_ext = Path(input_path).suffix.lower()
+        
+        if self.file_ext == '.pdf':
+            self._source = fitz.open(input_path)
+        elif self.file_ext in {'.png', '.jpg', '.jpeg'}:
+            with Image.open(input_path) as image:
+                image.load()
+                self._source = image.copy()
+        else:
+            raise ValueError(f"Unsupported file format: {self.file_ext}")
+        
+        logger.info(f"[Redaction] Opened {input_path} for repeated redaction")
+    
+    def redact_to(
+        self,
+        output_path: str,
+        entities: List[Dict],
+        redaction_style: str = 'black',
+        blur_radius: int = 10
+    ) -> Dict:
+        """Redact a fresh copy of the source into output_path; returns the same dict as redact_document"""
+        unique_entities = _dedupe_entities(entities, self.file_ext)
+        
+        if self.file_ext == '.pdf':
+            working = self._copy_source_pdf()
+            result = self.service._redact_pdf(working, output_path, unique_entities, redaction_style, blur_radius)
+        else:
+            result = self.service._redact_image(self._source.copy(), output_path, unique_entities, redaction_style, blur_radius)
+        result['total_entities'] = len(entities)
+        result['unique_entities'] = len(unique_entities)
+        
+        return result
+    
+    def _copy_source_pdf(self) -> fitz.Document:
+        """
+        An in-memory copy of the source PDF
+        
+        insert_pdf copies the already-parsed pages instead of re-reading the
+        file, but not the document-level parts, so the metadata, outline and
+        embedded files are carried over explicitly.
+        """
+        source = self._source
+        working = fitz.open()
+        working.insert_pdf(source)
+        # 'format' and 'encryption' describe the file and can't be set
+        working.set_metadata({key: value for key, value in source.metadata.items()
+                              if key not in ('format', 'encryption')})
+        working.set_toc(source.get_toc(simple=False))
+        for name in source.embfile_names():
+            info = source.embfile_info(name)
+            working.embfile_add(name, source.embfile_get(name), filename=info.get('filename'),
+                                ufilename=info.get('ufilename'), desc=info.get('desc'))
+        return working
+    
+    def close(self):
+        if self.file_ext == '.pdf':
+            self._source.close()
+    
+    def __enter__(self) -> 'RedactionContext':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
 def apply_redactions_to_pdf(
@@ -0,0 +1,15 @@
+from functools import lru_cache
+
+from app.core.config import settings
+from app.services.pii_detection_service import PIIDetectionService
+
+
+@lru_cache(maxsize=2)
+def get_service(minimal_pipeline: bool = False) -> PIIDetectionService:
+    """
+    Return the process-wide PIIDetectionService, loading its models on first use
+    
+    minimal_pipeline loads spaCy with NER only; that skips the parser's
+    sentence boundaries, so it's for debug scripts rather than the app.
+    """
+    return PIIDetectionService(spacy_model=settings.SPACY_MODEL, minimal_pipeline=minimal_pipeline)
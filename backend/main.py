@@ -1,18 +1,31 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.api import documents, auth, redaction, entities
 from app.core.config import settings
 from app.core.logging_config import setup_logging
+from app.services.service_cache import get_service
 import logging
 
 # Initialize logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the PII detector at boot instead of on the first request"""
+    service = get_service()
+    service.detect_pii("John Doe 123-45-6789 john@example.com (555) 123-4567")
+    logger.info("PII detection service warmed up")
+    yield
+
 app = FastAPI(
     title="PII Redactor API",
     description="API for redacting personally identifiable information from documents",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 logger.info("PII Redactor API starting up")
@@ -22,8 +35,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_HOSTS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists (no wildcard) let preflight headers be built once
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "X-Requested-With"],
+    max_age=86400,  # let browsers cache preflight responses for a day
 )
 
 # Include routers
@@ -1,29 +1,39 @@
 #!/usr/bin/env python
 """Quick test to check if backend is running and responsive"""
 
-import requests
-import json
+import asyncio
+import httpx
 
 BASE_URL = "http://localhost:8000"
 
+
+async def probe():
+    """Hit all endpoints concurrently over one shared client"""
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=5) as client:
+        return await asyncio.gather(
+            client.get("/health"),
+            client.get("/"),
+            return_exceptions=True
+        )
+
+
 print(f"Testing backend at {BASE_URL}")
 
+health, root = asyncio.run(probe())
+
 # Test 1: Health check
-try:
-    response = requests.get(f"{BASE_URL}/health", timeout=5)
-    print(f"✓ Health check: {response.status_code}")
-    print(f"  Response: {response.json()}")
-except Exception as e:
-    print(f"✗ Health check failed: {e}")
+if isinstance(health, Exception):
+    print(f"✗ Health check failed: {health}")
     print("  Backend might not be running!")
     exit(1)
+print(f"✓ Health check: {health.status_code}")
+print(f"  Response: {health.json()}")
 
 # Test 2: Root endpoint
-try:
-    response = requests.get(f"{BASE_URL}/", timeout=5)
-    print(f"✓ Root endpoint: {response.status_code}")
-    print(f"  Response: {response.json()}")
-except Exception as e:
-    print(f"✗ Root endpoint failed: {e}")
+if isinstance(root, Exception):
+    print(f"✗ Root endpoint failed: {root}")
+else:
+    print(f"✓ Root endpoint: {root.status_code}")
+    print(f"  Response: {root.json()}")
 
 print("\n✓ Backend is running and responsive!")
@@ -4,19 +4,19 @@ Test script to verify if FastAPI BackgroundTasks actually execute
 import asyncio
 import time
 from fastapi import BackgroundTasks, FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Global flag to track if task executed
 task_executed = False
 task_result = None
 
-def background_task(name: str):
-    """Simple background task for testing"""
+async def background_task(name: str):
+    """Simple background task for testing (runs on the event loop, not the threadpool)"""
     global task_executed, task_result
     print(f"[TEST TASK] STARTED at {time.time()}")
-    time.sleep(1)  # Simulate work
+    await asyncio.sleep(1)  # Simulate work
     task_executed = True
     task_result = f"Task {name} completed at {time.time()}"
     print(f"[TEST TASK] COMPLETED: {task_result}")
@@ -28,7 +28,7 @@ async def test_task_endpoint(background_tasks: BackgroundTasks):
     
     # Check if BackgroundTasks is None (the bug!)
     if background_tasks is None:
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": "BackgroundTasks is None - INJECTION FAILED!"},
             status_code=500
         )
@@ -2,6 +2,7 @@
 """Debug - check what's happening after merge"""
 
 from app.services.pii_detection_service import PIIDetectionService
+from app.services.service_cache import get_service
 import json
 
 # Monkey-patch to see what's being filtered
@@ -19,7 +20,8 @@ def debug_filter(self, entities):
 
 PIIDetectionService._filter_header_labels = debug_filter
 
-service = PIIDetectionService()
+# NER-only spaCy pipeline: loads faster, enough for a debug run
+service = get_service(minimal_pipeline=True)
 ssn_text = "My SSN is 123-45-6789"
 print(f"Testing: {ssn_text}")
 ssn_entities = service.detect_pii(ssn_text)
@@ -1,34 +1,44 @@
 #!/usr/bin/env python
 """Debug script to test PII detection"""
 
-from app.services.pii_detection_service import PIIDetectionService
+from app.services.service_cache import get_service
+from app.services.fast_ssn import scan_ssn
+from app.services.pii_utils import group_by_label
+from operator import itemgetter
+import numpy as np
 import re
 
-service = PIIDetectionService()
+_SUMMARY = itemgetter('label', 'text', 'method')
+
+# NER-only spaCy pipeline: loads faster, enough for a debug run
+service = get_service(minimal_pipeline=True)
+
+ssn_text = "My SSN is 123-45-6789"
+phone_text = "Call me at (555) 123-4567 or 555.987.6543"
+
+# Run both texts through the service in one batch
+ssn_entities, phone_entities = service.detect_pii_batch([ssn_text, phone_text])
 
 # Test SSN - check regex directly
 print("=" * 60)
 print("SSN Regex Test")
 print("=" * 60)
-ssn_text = "My SSN is 123-45-6789"
 ssn_pattern = r'\b\d{3}-\d{2}-\d{4}\b'
-regex_matches = list(re.finditer(ssn_pattern, ssn_text))
+ssn_matches = scan_ssn(np.frombuffer(ssn_text.encode(), np.uint8))
 print(f"Text: {ssn_text}")
 print(f"Regex pattern: {ssn_pattern}")
-print(f"Regex matches: {[m.group() for m in regex_matches]}")
+print(f"Scanner matches: {[ssn_text[start:end] for start, end in ssn_matches]}")
 
 # Test via service
 print("\nService Detection:")
-ssn_entities = service.detect_pii(ssn_text)
-ssn_list = [e for e in ssn_entities if e.get("label") == "SSN"]
+ssn_list = group_by_label(ssn_entities)["SSN"]
 print(f"SSN entities found: {len(ssn_list)}")
-print(f"All entities: {[(e['label'], e['text'], e.get('method', 'unknown')) for e in ssn_entities]}")
+print(f"All entities: {list(map(_SUMMARY, ssn_entities))}")
 
 # Test Phone
 print("\n" + "=" * 60)
 print("Phone Regex Test")
 print("=" * 60)
-phone_text = "Call me at (555) 123-4567 or 555.987.6543"
 phone_pattern1 = r'\b\(\d{3}\)\s*\d{3}-\d{4}\b'
 phone_pattern2 = r'\b\d{3}\.\d{3}\.\d{4}\b'
 print(f"Text: {phone_text}")
@@ -37,7 +47,6 @@ print(f"Pattern 2 matches: {[m.group() for m in re.finditer(phone_pattern2, phon
 
 # Test via service
 print("\nService Detection:")
-phone_entities = service.detect_pii(phone_text)
-phone_list = [e for e in phone_entities if e.get("label") == "PHONE"]
+phone_list = group_by_label(phone_entities)["PHONE"]
 print(f"PHONE entities found: {len(phone_list)}")
-print(f"All entities: {[(e['label'], e['text'], e.get('method', 'unknown')) for e in phone_entities]}")
+print(f"All entities: {list(map(_SUMMARY, phone_entities))}")
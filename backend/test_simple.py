@@ -1,13 +1,15 @@
 #!/usr/bin/env python
 """Debug script - simplified"""
 
-from app.services.pii_detection_service import PIIDetectionService
+from app.services.service_cache import get_service
+from app.services.pii_utils import group_by_label
 import logging
 
 # Set up detailed logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
-service = PIIDetectionService()
+# NER-only spaCy pipeline: loads faster, enough for a debug run
+service = get_service(minimal_pipeline=True)
 
 # Test SSN
 ssn_text = "My SSN is 123-45-6789"
@@ -18,8 +20,7 @@ print("\n=== FINAL RESULTS ===")
 for e in ssn_entities:
     print(f"  {e['label']:15} | {e['text']:20} | Method: {e.get('method', 'unknown')}")
 
-ssn_list = [e for e in ssn_entities if e.get("label") == "SSN"]
+ssn_list = group_by_label(ssn_entities)["SSN"]
 print(f"\nSSN Count: {len(ssn_list)}")
 for s in ssn_list:
     print(f"  Found: {s['text']}")
-
@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 """Debug - full trace"""
 
-from app.services.pii_detection_service import PIIDetectionService
+from app.services.service_cache import get_service
+from tests.conftest import TEST_DATA
 
-service = PIIDetectionService()
+# NER-only spaCy pipeline: loads faster, enough for a debug run
+service = get_service(minimal_pipeline=True)
 
 # Get the base detect_pii step by step
 ssn_text = "My SSN is 123-45-6789"
+phone_text = "Call me at (555) 123-4567 or 555.987.6543"
 
 # Step 1: Regex detection
 regex_entities = service._detect_with_regex(ssn_text)
@@ -31,3 +34,21 @@ merged = service._merge_overlapping_entities(all_entities)
 print(f"\n=== AFTER MERGE ({len(merged)} entities) ===")
 for e in merged:
     print(f"  {e['label']:15} | Text: '{e['text']:20}' | Pos: {e['start_pos']:3}-{e['end_pos']:3} | Method: {e['method']}")
+
+# Step 4: Full pipeline, both texts in one batch
+texts = [ssn_text, phone_text]
+print(f"\n=== FULL PIPELINE ({len(texts)} texts, batched) ===")
+for text, entities in zip(texts, service.detect_pii_batch(texts)):
+    print(f"Text: {text}")
+    for e in entities:
+        print(f"  {e['label']:15} | Text: '{e['text']:20}' | Pos: {e['start_pos']:3}-{e['end_pos']:3} | Method: {e['method']}")
+
+# Step 5: SpaCy trace over every sample text, forwarded in batches
+if service.nlp is not None:
+    samples = list(TEST_DATA.items())
+    docs = service.nlp.pipe((text for _, text in samples), batch_size=8)
+    print(f"\n=== SPACY TRACE ({len(samples)} sample texts, batched) ===")
+    for (name, text), doc in zip(samples, docs):
+        print(f"Sample: {name}")
+        for e in service._detect_with_spacy(text, 0.85, doc=doc):
+            print(f"  {e['label']:15} | Text: '{e['text']:20}' | Pos: {e['start_pos']:3}-{e['end_pos']:3}")
@@ -4,15 +4,20 @@ Provides test data, mock objects, and reusable fixtures.
 """
 
 import pytest
+import gc
 import tempfile
 import os
-from pathlib import Path
-from PIL import Image, ImageDraw
+import shutil
 try:
-    import fitz  # PyMuPDF
+    import re2 as re  # google-re2: DFA matching, linear time on any input
 except ImportError:
-    fitz = None
+    import re
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
 from typing import Dict, List
+from app.services.pii_utils import group_by_label
 
 # Test data constants
 TEST_DATA = {
@@ -37,34 +42,254 @@ TEST_DATA = {
     """,
 }
 
-PII_PATTERNS = {
+PII_PATTERN_SOURCES = {
     "email": r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}",
     "ssn": r"\d{3}-\d{2}-\d{4}",
     "phone": r"(\(\d{3}\)\s?|\d{3}-)\d{3}-\d{4}",
     "credit_card": r"\d{4}-\d{4}-\d{4}-\d{4}",
 }
 
+# Compiled once at import; none of the patterns use backreferences, so they
+# are all RE2-compatible.
+PII_PATTERNS = {name: re.compile(pattern) for name, pattern in PII_PATTERN_SOURCES.items()}
+
+# All patterns as one alternation, so a single pass labels every match via
+# the winning named group.
+_UNION = re.compile("|".join(
+    f"(?P<{name}>{pattern})" for name, pattern in PII_PATTERN_SOURCES.items()
+))
+
+
+def scan_all(text: str) -> List[tuple]:
+    """Return (label, start, end, text) for every PII match in one scan."""
+    return [(m.lastgroup, m.start(), m.end(), m.group()) for m in _UNION.finditer(text)]
+
+
+@lru_cache(maxsize=1)
+def _default_font():
+    """Load PIL's default font once per session."""
+    from PIL import ImageFont
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1)
+def _sample_image_template():
+    """Rasterize the sample image text once; fixtures save from this template."""
+    from PIL import Image, ImageDraw
+    
+    # Create image with text
+    img = Image.new('RGB', (600, 400), color='white')
+    draw = ImageDraw.Draw(img)
+    
+    text_content = """
+    Sample Image Document
+    
+    Name: Jane Smith
+    Email: jane.smith@example.com
+    Phone: (555) 987-6543
+    """
+    
+    draw.text((50, 50), text_content, font=_default_font(), fill='black')
+    return img
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", default=False,
+                     help="Run tests marked slow (heavy NER), skipped by default")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test, use --run-slow to run")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(scope="session")
+def pii_service():
+    """Provide one PII detection service for the whole session."""
+    from app.services.service_cache import get_service
+    return get_service()
+
+
+@pytest.fixture(scope="session")
+def detections(pii_service):
+    """Detect PII in every TEST_DATA sample once, batched through nlp.pipe."""
+    batch_size = int(os.getenv("PII_SPACY_BATCH_SIZE", "32"))
+    results = pii_service.detect_pii_batch(list(TEST_DATA.values()), batch_size=batch_size)
+    return MappingProxyType(dict(zip(TEST_DATA, results)))
+
+
+@pytest.fixture(scope="session")
+def redaction_service():
+    """Provide one redaction service for the whole session."""
+    from app.services.redaction_service import RedactionService
+    return RedactionService()
+
+
+# Redaction tests check content, not file size: skip PDF cleanup and compression
+FAST_PDF_SAVE_OPTIONS = MappingProxyType({"garbage": 0, "deflate": False, "clean": False})
+
+# Largest batch the parallel redaction tests submit at once
+REDACTION_POOL_WORKERS = 5
+
+
+@pytest.fixture(scope="session")
+def fast_redaction_service():
+    """Provide a redaction service that writes PDFs without cleanup or compression."""
+    from app.services.redaction_service import RedactionService
+    return RedactionService(save_options=FAST_PDF_SAVE_OPTIONS)
+
+
+@pytest.fixture(scope="session")
+def incremental_redaction_service():
+    """
+    Provide a redaction service that saves PDFs incrementally, for tests that only check the output exists.
+    
+    Appending leaves the original, unredacted objects in the output file, so
+    this only exists here and never in the service itself.
+    """
+    import fitz
+    from app.services.redaction_service import RedactionService
+    
+    class IncrementalRedactionService(RedactionService):
+        def _open_pdf(self, source, output_path):
+            if isinstance(source, fitz.Document):
+                return source
+            # Incremental saves only work in place, so redact a copy at output_path
+            if isinstance(source, bytes):
+                Path(output_path).write_bytes(source)
+            else:
+                shutil.copyfile(source, output_path)
+            return fitz.open(output_path)
+        
+        def _save_pdf(self, doc, output_path):
+            if doc.name != output_path:
+                super()._save_pdf(doc, output_path)
+            elif doc.can_save_incrementally():
+                # Incremental saves can't garbage-collect or clean
+                doc.save(output_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            else:
+                # Repaired on open; the file can't be appended to, so rewrite it
+                data = doc.tobytes(**self.save_options)
+                doc.close()
+                Path(output_path).write_bytes(data)
+    
+    return IncrementalRedactionService(save_options=FAST_PDF_SAVE_OPTIONS)
+
+
+@pytest.fixture(scope="session")
+def redaction_pool():
+    """
+    Provide a process pool for parallel redaction, with every worker already started.
+    
+    Workers are spawned rather than forked, since forking after torch and
+    numba are loaded can deadlock, and each builds its redaction service
+    once in the initializer. Submit tests.redaction_worker.redact_document.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from tests import redaction_worker
+    
+    workers = min(REDACTION_POOL_WORKERS, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=redaction_worker.init_worker) as pool:
+        # Start-up and initializers happen here, outside any timed region
+        list(pool.map(redaction_worker.ready, range(workers)))
+        yield pool
+
+
+@contextmanager
+def _gc_paused():
+    """Collect garbage up front, then keep the collector off for the block."""
+    gc.collect()
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+@pytest.fixture
+def gc_paused():
+    """Provide a context manager that pauses GC around timed regions."""
+    return _gc_paused
+
+
+# RAM-backed tmpfs where available, so timed writes don't measure the disk
+FAST_TMP_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+
+
+@pytest.fixture(scope="session")
+def ocr_image_to_text():
+    """
+    Provide an OCR callable (image path -> text), or None without an engine.
+    
+    Prefers one tesserocr API held open for the session over pytesseract,
+    which spawns a tesseract process per call.
+    """
+    try:
+        from tesserocr import PyTessBaseAPI
+        api = PyTessBaseAPI()
+    except (ImportError, RuntimeError):
+        api = None
+    
+    if api is not None:
+        def image_to_text(image_path):
+            api.SetImageFile(image_path)
+            return api.GetUTF8Text()
+        
+        try:
+            yield image_to_text
+        finally:
+            api.End()
+        return
+    
+    try:
+        import pytesseract
+    except ImportError:
+        yield None
+        return
+    
+    yield pytesseract.image_to_string
+
 
 @pytest.fixture
 def test_temp_dir():
-    """Create a temporary directory for test files."""
-    with tempfile.TemporaryDirectory() as tmpdir:
+    """
+    Create a temporary directory for test files, unique per xdist worker.
+    
+    Lives on tmpfs (/dev/shm) when available so redaction output never hits
+    the disk; on macOS/Windows, or if /dev/shm isn't writable, it falls back
+    to the system temp directory.
+    """
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    with tempfile.TemporaryDirectory(prefix=f"w{worker_id}_", dir=FAST_TMP_ROOT) as tmpdir:
         yield tmpdir
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_text_data():
-    """Provide sample text data with various PII types."""
-    return TEST_DATA.copy()
+    """Provide sample text data with various PII types (read-only)."""
+    return MappingProxyType(TEST_DATA)
 
 
-@pytest.fixture
-def sample_pdf_path(test_temp_dir):
-    """Create a sample PDF document for testing."""
-    if fitz is None:
-        pytest.skip("PyMuPDF not installed")
+@pytest.fixture(scope="session")
+def sample_text_bytes(sample_text_data):
+    """Provide the sample texts pre-encoded as UTF-8 for byte-level scanners."""
+    return MappingProxyType({key: text.encode('utf-8') for key, text in sample_text_data.items()})
+
+
+@pytest.fixture(scope="session")
+def sample_pdf_template(tmp_path_factory):
+    """Create the sample PDF once per session; per-test fixtures copy it."""
+    fitz = pytest.importorskip("fitz", reason="PyMuPDF not installed")
     
-    pdf_path = os.path.join(test_temp_dir, "sample.pdf")
+    pdf_path = str(tmp_path_factory.mktemp("pdf_template") / "sample.pdf")
     
     # Create PDF with text
     doc = fitz.open()
@@ -85,6 +310,40 @@ def sample_pdf_path(test_temp_dir):
     doc.save(pdf_path)
     doc.close()
     
+    return pdf_path
+
+
+@pytest.fixture(scope="session")
+def sample_pdf_text(sample_pdf_template):
+    """Provide the text of the sample PDF, extracted once per session."""
+    import fitz
+    
+    with fitz.open(sample_pdf_template) as doc:
+        # Pages separated by form feeds, as pdftotext does
+        return chr(12).join(page.get_text() for page in doc)
+
+
+@pytest.fixture(scope="session")
+def sample_pdf_bytes(sample_pdf_template):
+    """Provide the raw bytes of the sample PDF, read once per session."""
+    return Path(sample_pdf_template).read_bytes()
+
+
+@pytest.fixture(scope="session")
+def original_pdf_page_count(sample_pdf_template):
+    """Provide the page count of the sample PDF, read once per session."""
+    import fitz
+    
+    with fitz.open(sample_pdf_template) as doc:
+        return doc.page_count
+
+
+@pytest.fixture
+def sample_pdf_path(test_temp_dir, sample_pdf_template):
+    """Create a sample PDF document for testing."""
+    pdf_path = os.path.join(test_temp_dir, "sample.pdf")
+    shutil.copyfile(sample_pdf_template, pdf_path)
+    
     yield pdf_path
     
     # Cleanup
@@ -92,25 +351,21 @@ def sample_pdf_path(test_temp_dir):
         os.remove(pdf_path)
 
 
+@pytest.fixture(scope="session")
+def corrupted_pdf(tmp_path_factory):
+    """Create a file with a .pdf extension but invalid contents, once per session."""
+    corrupted_path = tmp_path_factory.mktemp("corrupted") / "corrupted.pdf"
+    corrupted_path.write_bytes(b"This is not a valid PDF")
+    return str(corrupted_path)
+
+
 @pytest.fixture
 def sample_image_path(test_temp_dir):
     """Create a sample image document for testing."""
     image_path = os.path.join(test_temp_dir, "sample.png")
     
-    # Create image with text
-    img = Image.new('RGB', (600, 400), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    text_content = """
-    Sample Image Document
-    
-    Name: Jane Smith
-    Email: jane.smith@example.com
-    Phone: (555) 987-6543
-    """
-    
-    draw.text((50, 50), text_content, fill='black')
-    img.save(image_path)
+    # Saving does not modify the template, so no copy is needed
+    _sample_image_template().save(image_path)
     
     yield image_path
     
@@ -119,6 +374,22 @@ def sample_image_path(test_temp_dir):
         os.remove(image_path)
 
 
+@pytest.fixture(scope="session")
+def sample_image_bytes():
+    """Provide the sample image PNG-encoded in memory, once per session."""
+    import io
+    
+    buf = io.BytesIO()
+    _sample_image_template().save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def original_image_size():
+    """Provide the (width, height) of the sample image."""
+    return _sample_image_template().size
+
+
 @pytest.fixture
 def sample_entities():
     """Provide sample entity detections for testing."""
@@ -150,12 +421,24 @@ def sample_entities():
     ]
 
 
+@pytest.fixture
+def sample_entities_by_label(sample_entities):
+    """Provide sample entity detections grouped by label."""
+    return group_by_label(sample_entities)
+
+
 @pytest.fixture
 def pii_patterns():
-    """Provide PII detection patterns."""
+    """Provide compiled PII detection patterns."""
     return PII_PATTERNS.copy()
 
 
+@pytest.fixture
+def pii_scanner():
+    """Provide the single-pass union scanner over all PII patterns."""
+    return scan_all
+
+
 @pytest.fixture
 def mock_spacy_model():
     """Mock spaCy model for testing without loading actual model."""
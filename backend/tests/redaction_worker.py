@@ -0,0 +1,26 @@
+"""
+Redaction entry points for pool worker processes.
+Lets tests fan redaction out across processes, since PyMuPDF is not thread-safe.
+"""
+
+import os
+
+# Built once per worker by init_worker
+_service = None
+
+
+def init_worker():
+    """Pool initializer: import the redaction stack and build the worker's service."""
+    global _service
+    from app.services.redaction_service import RedactionService
+    _service = RedactionService()
+
+
+def ready(_=None) -> int:
+    """No-op task used to bring a worker up before any timing starts."""
+    return os.getpid()
+
+
+def redact_document(**kwargs):
+    """Run RedactionService.redact_document on this worker's service."""
+    return _service.redact_document(**kwargs)
@@ -7,39 +7,37 @@ import pytest
 import os
 import json
 import sys
+import time
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from concurrent.futures import as_completed
 from pathlib import Path
 import logging
+from PIL import Image
+from app.services.redaction_service import RedactionService
+from tests import redaction_worker
 
 logger = logging.getLogger(__name__)
 
+pytestmark = pytest.mark.integration
+
 
 class TestEndToEndWorkflow:
     """Test complete workflows from document upload to redacted output."""
     
-    def test_pdf_processing_workflow(self, sample_pdf_path, test_temp_dir):
+    def test_pdf_processing_workflow(self, sample_pdf_path, sample_pdf_text, test_temp_dir, pii_service):
         """Test complete PDF processing workflow."""
-        from app.services.pii_detection_service import PIIDetectionService
-        from app.services.redaction_service import RedactionService
-        import fitz
-        
-        # Step 1: Extract text from PDF
-        doc = fitz.open(sample_pdf_path)
-        extracted_text = ""
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            extracted_text += page.get_text()
-        doc.close()
+        
+        # Step 1: Extract text from PDF (extracted once per session)
+        extracted_text = sample_pdf_text
         
         assert len(extracted_text) > 0, "Should extract text from PDF"
-        logger.info(f"✓ Step 1: Extracted {len(extracted_text)} chars from PDF")
+        logger.info("✓ Step 1: Extracted %d chars from PDF", len(extracted_text))
         
         # Step 2: Detect PII
-        detection_service = PIIDetectionService()
-        entities = detection_service.detect_pii(extracted_text)
+        entities = pii_service.detect_pii(extracted_text)
         
         assert isinstance(entities, list), "Detection should return list"
-        logger.info(f"✓ Step 2: Detected {len(entities)} PII entities")
+        logger.info("✓ Step 2: Detected %d PII entities", len(entities))
         
         # Step 3: Redact document
         redaction_service = RedactionService()
@@ -52,24 +50,23 @@ class TestEndToEndWorkflow:
         )
         
         assert os.path.exists(output_path), "Redacted document should exist"
-        logger.info(f"✓ Step 3: Created redacted document at {output_path}")
+        logger.info("✓ Step 3: Created redacted document at %s", output_path)
         
         # Verify output
         assert result.get('total_entities') > 0 or len(entities) == 0
-        logger.info(f"✓ Workflow complete: {result.get('redacted_entities', 0)} entities redacted")
+        logger.info("✓ Workflow complete: %s entities redacted", result.get('redacted_entities', 0))
     
-    def test_image_processing_workflow(self, sample_image_path, test_temp_dir):
+    def test_image_processing_workflow(self, sample_image_path, original_image_size, test_temp_dir, ocr_image_to_text):
         """Test complete image processing workflow."""
-        from app.services.redaction_service import RedactionService
-        from PIL import Image
-        import pytesseract
         
         # Step 1: Extract text via OCR
         try:
-            ocr_text = pytesseract.image_to_string(sample_image_path)
-            logger.info(f"✓ Step 1: OCR extracted {len(ocr_text)} chars")
+            if ocr_image_to_text is None:
+                raise ImportError("no OCR engine installed")
+            ocr_text = ocr_image_to_text(sample_image_path)
+            logger.info("✓ Step 1: OCR extracted %d chars", len(ocr_text))
         except Exception as e:
-            logger.warning(f"ℹ OCR not available: {e}")
+            logger.warning("ℹ OCR not available: %s", e)
             ocr_text = "Sample OCR text"
         
         # Step 2: Use sample entities
@@ -94,30 +91,28 @@ class TestEndToEndWorkflow:
         )
         
         assert os.path.exists(output_path), "Redacted image should exist"
-        logger.info(f"✓ Step 3: Created redacted image")
+        logger.info("✓ Step 3: Created redacted image")
         
-        # Verify image integrity
-        img = Image.open(output_path)
-        assert img.size == Image.open(sample_image_path).size
-        logger.info(f"✓ Image integrity verified")
+        # Verify image integrity; .size only reads the header
+        with Image.open(output_path) as img:
+            assert img.size == original_image_size
+        logger.info("✓ Image integrity verified")
 
 
 class TestComponentIntegration:
     """Test integration between different components."""
     
-    def test_detection_redaction_integration(self, sample_text_data, sample_pdf_path, test_temp_dir):
+    def test_detection_redaction_integration(self, sample_text_data, sample_pdf_path, test_temp_dir, pii_service):
         """Test that detected entities can be successfully redacted."""
-        from app.services.pii_detection_service import PIIDetectionService
-        from app.services.redaction_service import RedactionService
         
         # Detect PII
-        detector = PIIDetectionService()
+        detector = pii_service
         text = sample_text_data["mixed_pii_text"]
         detected_entities = detector.detect_pii(text)
         
         # Verify detection
         assert len(detected_entities) > 0, "Should detect entities"
-        logger.info(f"✓ Detected {len(detected_entities)} entities")
+        logger.info("✓ Detected %d entities", len(detected_entities))
         
         # Attempt redaction
         redactor = RedactionService()
@@ -130,11 +125,10 @@ class TestComponentIntegration:
         )
         
         assert result is not None
-        logger.info(f"✓ Integration successful: detected entities redacted")
+        logger.info("✓ Integration successful: detected entities redacted")
     
     def test_multiple_pii_types_redaction(self, sample_pdf_path, test_temp_dir):
         """Test redaction of multiple PII types."""
-        from app.services.redaction_service import RedactionService
         
         # Create entities with various PII types
         entities = [
@@ -154,13 +148,12 @@ class TestComponentIntegration:
         )
         
         assert result.get('total_entities') == len(entities)
-        logger.info(f"✓ Multiple PII types redacted: {len(entities)} entities")
+        logger.info("✓ Multiple PII types redacted: %d entities", len(entities))
     
-    def test_detection_accuracy_with_redaction(self, sample_text_data, test_temp_dir):
+    def test_detection_accuracy_with_redaction(self, sample_text_data, test_temp_dir, pii_service):
         """Test that detection results in proper redaction."""
-        from app.services.pii_detection_service import PIIDetectionService
         
-        detector = PIIDetectionService()
+        detector = pii_service
         text = sample_text_data["complex_text"]
         
         # Test different confidence thresholds
@@ -169,26 +162,25 @@ class TestComponentIntegration:
         
         # Higher threshold should give fewer entities
         assert len(high_conf_entities) <= len(low_conf_entities)
-        logger.info(f"✓ Confidence filtering working: {len(high_conf_entities)} -> {len(low_conf_entities)}")
+        logger.info("✓ Confidence filtering working: %d -> %d", len(high_conf_entities), len(low_conf_entities))
 
 
 class TestDataFlow:
     """Test data flow through the system."""
     
-    def test_entity_data_structure_consistency(self, sample_text_data):
+    def test_entity_data_structure_consistency(self, sample_text_data, pii_service):
         """Test that entity data structures are consistent through the pipeline."""
-        from app.services.pii_detection_service import PIIDetectionService
         
-        detector = PIIDetectionService()
+        detector = pii_service
         text = sample_text_data["mixed_pii_text"]
         entities = detector.detect_pii(text)
         
         # Check structure consistency
-        required_fields = {'text', 'label', 'confidence'}
+        required_fields = frozenset({'text', 'label', 'confidence'})
         
         for entity in entities:
-            assert all(field in entity for field in required_fields), \
-                f"Entity missing required fields: {entity}"
+            missing = required_fields - entity.keys()
+            assert not missing, f"Entity missing required fields {sorted(missing)}: {entity}"
             
             # Type checks
             assert isinstance(entity['text'], str)
@@ -196,13 +188,12 @@ class TestDataFlow:
             assert isinstance(entity['confidence'], (int, float))
             assert 0 <= entity['confidence'] <= 1
         
-        logger.info(f"✓ Data structure consistency verified for {len(entities)} entities")
+        logger.info("✓ Data structure consistency verified for %d entities", len(entities))
     
-    def test_entity_position_accuracy(self, sample_text_data):
+    def test_entity_position_accuracy(self, sample_text_data, pii_service):
         """Test that entity positions are accurate."""
-        from app.services.pii_detection_service import PIIDetectionService
         
-        detector = PIIDetectionService()
+        detector = pii_service
         text = sample_text_data["simple_text"]
         entities = detector.detect_pii(text)
         
@@ -218,22 +209,17 @@ class TestDataFlow:
                 # Verify text matches
                 if 'text' in entity:
                     extracted = text[start:end]
-                    logger.debug(f"  Position check: {start}-{end} = '{extracted}'")
+                    logger.debug("  Position check: %s-%s = '%s'", start, end, extracted)
         
-        logger.info(f"✓ Entity positions verified for {len(entities)} entities")
+        logger.info("✓ Entity positions verified for %d entities", len(entities))
 
 
 class TestErrorRecovery:
     """Test system behavior during error conditions."""
     
-    def test_graceful_handling_of_corrupted_input(self, test_temp_dir, sample_entities):
+    def test_graceful_handling_of_corrupted_input(self, test_temp_dir, corrupted_pdf, sample_entities):
         """Test handling of corrupted input files."""
-        from app.services.redaction_service import RedactionService
-        
-        # Create corrupted PDF file
-        corrupted_path = os.path.join(test_temp_dir, "corrupted.pdf")
-        with open(corrupted_path, 'wb') as f:
-            f.write(b"This is not a valid PDF")
+        corrupted_path = corrupted_pdf
         
         redactor = RedactionService()
         output_path = os.path.join(test_temp_dir, "output.pdf")
@@ -246,37 +232,34 @@ class TestErrorRecovery:
             )
             logger.info("✓ Corrupted input handled gracefully")
         except Exception as e:
-            logger.info(f"✓ Corrupted input caught: {type(e).__name__}")
+            logger.info("✓ Corrupted input caught: %s", type(e).__name__)
     
-    def test_large_document_handling(self, test_temp_dir):
+    def test_large_document_handling(self, test_temp_dir, pii_service):
         """Test handling of large documents."""
-        from app.services.pii_detection_service import PIIDetectionService
         
-        detector = PIIDetectionService()
+        detector = pii_service
         
         # Create large text document
         large_text = ("Name: John Doe, Email: john@example.com, " * 1000)
         
         try:
             entities = detector.detect_pii(large_text)
-            logger.info(f"✓ Large document processed: {len(large_text)} chars -> {len(entities)} entities")
+            logger.info("✓ Large document processed: %d chars -> %d entities", len(large_text), len(entities))
         except Exception as e:
-            logger.warning(f"ℹ Large document handling: {e}")
+            logger.warning("ℹ Large document handling: %s", e)
 
 
 class TestConformanceAndCompliance:
     """Test compliance with security and privacy standards."""
     
-    def test_sensitive_data_not_logged(self, sample_text_data):
+    def test_sensitive_data_not_logged(self, sample_text_data, pii_service):
         """Test that sensitive data is not exposed in logs."""
-        from app.services.pii_detection_service import PIIDetectionService
-        import logging
         
         # Setup a handler to capture logs
         log_capture = []
         handler = logging.StreamHandler()
         
-        detector = PIIDetectionService()
+        detector = pii_service
         text = sample_text_data["mixed_pii_text"]
         
         # Process text
@@ -288,8 +271,6 @@ class TestConformanceAndCompliance:
     
     def test_original_document_integrity(self, sample_pdf_path, sample_entities, test_temp_dir):
         """Test that original document is not modified during redaction."""
-        from app.services.redaction_service import RedactionService
-        import os
         
         # Get original file size and modification time
         original_size = os.path.getsize(sample_pdf_path)
@@ -312,60 +293,47 @@ class TestConformanceAndCompliance:
         logger.info("✓ Original document integrity verified")
 
 
+@pytest.mark.serial
 class TestPerformanceIntegration:
     """Test performance characteristics in integrated scenarios."""
     
-    def test_batch_document_processing(self, sample_pdf_path, sample_entities, test_temp_dir):
-        """Test processing multiple documents in sequence."""
-        from app.services.redaction_service import RedactionService
-        import time
-        
-        redactor = RedactionService()
+    def test_batch_document_processing(self, sample_pdf_path, sample_entities, test_temp_dir, redaction_pool, gc_paused):
+        """Test processing multiple documents in parallel."""
         
-        # Process multiple documents
-        processing_times = []
         doc_count = 3
         
-        for i in range(doc_count):
-            output_path = os.path.join(test_temp_dir, f"redacted_{i}.pdf")
-            
-            start_time = time.time()
-            result = redactor.redact_document(
-                input_path=sample_pdf_path,
-                output_path=output_path,
-                entities=sample_entities
-            )
-            elapsed = time.time() - start_time
-            processing_times.append(elapsed)
-        
-        avg_time = sum(processing_times) / len(processing_times)
-        logger.info(f"✓ Batch processing: {doc_count} docs in {sum(processing_times):.2f}s (avg: {avg_time:.2f}s)")
+        # PyMuPDF is not thread-safe, so fan out across the (already started) worker processes
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
+            futures = [
+                redaction_pool.submit(
+                    redaction_worker.redact_document,
+                    input_path=sample_pdf_path,
+                    output_path=os.path.join(test_temp_dir, f"redacted_{i}.pdf"),
+                    entities=sample_entities
+                )
+                for i in range(doc_count)
+            ]
+            results = [future.result() for future in as_completed(futures)]
+            elapsed = (time.perf_counter_ns() - start_time_ns) / 1e9
+        
+        assert len(results) == doc_count
+        logger.info("✓ Batch processing: %s docs in %.2fs (avg: %.2fs)", doc_count, elapsed, elapsed / doc_count)
     
-    def test_detection_scaling(self, sample_text_data):
+    @pytest.mark.parametrize("multiplier", [1, 2, 5, 10])
+    def test_detection_scaling(self, sample_text_data, pii_service, gc_paused, multiplier):
         """Test detection performance with increasing text size."""
-        from app.services.pii_detection_service import PIIDetectionService
-        import time
-        
-        detector = PIIDetectionService()
-        base_text = sample_text_data["complex_text"]
+        detector = pii_service
+        text = sample_text_data["complex_text"] * multiplier
         
-        results = []
-        for multiplier in [1, 5, 10]:
-            text = base_text * multiplier
-            
-            start_time = time.time()
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
             entities = detector.detect_pii(text)
-            elapsed = time.time() - start_time
-            
-            results.append({
-                'text_size': len(text),
-                'entity_count': len(entities),
-                'time_ms': elapsed * 1000
-            })
-        
-        logger.info("✓ Detection scaling test results:")
-        for r in results:
-            logger.debug(f"  Size: {r['text_size']} chars, Entities: {r['entity_count']}, Time: {r['time_ms']:.2f}ms")
+            elapsed = (time.perf_counter_ns() - start_time_ns) / 1e9
+        
+        assert isinstance(entities, list)
+        logger.info("✓ Detection scaling %sx: %d chars, %d entities, %.2fms",
+                    multiplier, len(text), len(entities), elapsed * 1000)
 
 
 if __name__ == "__main__":
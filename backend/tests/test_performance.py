@@ -4,50 +4,59 @@ Measures execution time, memory usage, and scalability characteristics.
 """
 
 import pytest
+import tempfile
 import time
 import logging
 import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import psutil
 import tracemalloc
+from array import array
+from statistics import fmean
+import fitz
+from concurrent.futures import as_completed
+from tests import redaction_worker
 
 logger = logging.getLogger(__name__)
 
+pytestmark = [pytest.mark.performance, pytest.mark.serial]
+
 
 class PerformanceMetrics:
     """Helper class to collect and report performance metrics."""
     
     def __init__(self):
-        self.metrics: List[Dict] = []
+        # Columnar storage: one array per field instead of a dict per record
+        self.names: List[str] = []
+        self.durations = array('d')
+        self.memories = array('d')
+        self.timestamps = array('d')
     
     def record(self, name: str, duration_ms: float, memory_mb: float = 0):
         """Record a performance metric."""
-        self.metrics.append({
-            'name': name,
-            'duration_ms': duration_ms,
-            'memory_mb': memory_mb,
-            'timestamp': time.time()
-        })
+        self.names.append(name)
+        self.durations.append(duration_ms)
+        self.memories.append(memory_mb)
+        self.timestamps.append(time.time())
     
     def get_summary(self) -> Dict:
         """Get summary statistics."""
-        if not self.metrics:
+        if not self.durations:
             return {}
         
-        durations = [m['duration_ms'] for m in self.metrics]
-        memories = [m['memory_mb'] for m in self.metrics if m['memory_mb'] > 0]
+        memories = [m for m in self.memories if m > 0]
         
         return {
-            'count': len(self.metrics),
-            'total_time_ms': sum(durations),
-            'avg_time_ms': sum(durations) / len(durations),
-            'min_time_ms': min(durations),
-            'max_time_ms': max(durations),
+            'count': len(self.durations),
+            'total_time_ms': sum(self.durations),
+            'avg_time_ms': fmean(self.durations),
+            'min_time_ms': min(self.durations),
+            'max_time_ms': max(self.durations),
             'peak_memory_mb': max(memories) if memories else 0,
-            'avg_memory_mb': sum(memories) / len(memories) if memories else 0
+            'avg_memory_mb': fmean(memories) if memories else 0
         }
     
     def report(self):
@@ -69,6 +78,13 @@ Performance Summary:
         return report
 
 
+def benchmark_mean_ms(benchmark) -> Optional[float]:
+    """Mean time per call in ms, or None when benchmarking is disabled (e.g. under xdist)."""
+    if benchmark.stats is None:
+        return None
+    return benchmark.stats.stats.mean * 1000
+
+
 @pytest.fixture
 def perf_metrics():
     """Provide performance metrics collector."""
@@ -79,35 +95,34 @@ class TestPIIDetectionPerformance:
     """Performance tests for PII detection."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, pii_service):
         """Setup test fixtures."""
-        from app.services.pii_detection_service import PIIDetectionService
-        self.service = PIIDetectionService()
+        self.service = pii_service
     
-    def test_detection_speed_simple_text(self, sample_text_data, perf_metrics):
+    def test_detection_speed_simple_text(self, benchmark, sample_text_data, perf_metrics):
         """Test detection speed on simple text."""
         text = sample_text_data["simple_text"]
         
-        start_time = time.time()
-        entities = self.service.detect_pii(text)
-        elapsed = (time.time() - start_time) * 1000  # ms
-        
-        perf_metrics.record("simple_text_detection", elapsed)
+        entities = benchmark(self.service.detect_pii, text)
+        elapsed = benchmark_mean_ms(benchmark)
         
-        logger.info(f"✓ Simple text detection: {elapsed:.2f}ms for {len(entities)} entities")
-        assert elapsed < 5000, "Simple detection should be fast"
+        assert isinstance(entities, list)
+        if elapsed is not None:
+            perf_metrics.record("simple_text_detection", elapsed)
+            logger.info("✓ Simple text detection: %.2fms for %d entities", elapsed, len(entities))
+            assert elapsed < 5000, "Simple detection should be fast"
     
-    def test_detection_speed_complex_text(self, sample_text_data, perf_metrics):
+    def test_detection_speed_complex_text(self, benchmark, sample_text_data, perf_metrics):
         """Test detection speed on complex text."""
         text = sample_text_data["complex_text"]
         
-        start_time = time.time()
-        entities = self.service.detect_pii(text)
-        elapsed = (time.time() - start_time) * 1000  # ms
-        
-        perf_metrics.record("complex_text_detection", elapsed)
+        entities = benchmark(self.service.detect_pii, text)
+        elapsed = benchmark_mean_ms(benchmark)
         
-        logger.info(f"✓ Complex text detection: {elapsed:.2f}ms for {len(entities)} entities")
+        assert isinstance(entities, list)
+        if elapsed is not None:
+            perf_metrics.record("complex_text_detection", elapsed)
+            logger.info("✓ Complex text detection: %.2fms for %d entities", elapsed, len(entities))
     
     def test_detection_memory_usage(self, sample_text_data):
         """Test memory usage during detection."""
@@ -121,83 +136,84 @@ class TestPIIDetectionPerformance:
         tracemalloc.stop()
         
         peak_mb = peak / 1024 / 1024
-        logger.info(f"✓ Detection memory: {peak_mb:.2f}MB for {len(text)} chars")
+        logger.info("✓ Detection memory: %.2fMB for %d chars", peak_mb, len(text))
     
-    def test_detection_scaling_linear(self, sample_text_data, perf_metrics):
+    @pytest.mark.parametrize("multiplier", [1, 2, 5, 10])
+    def test_detection_scaling_linear(self, sample_text_data, perf_metrics, gc_paused, multiplier):
         """Test that detection scales linearly with text size."""
         base_text = sample_text_data["mixed_pii_text"]
+        text = base_text * multiplier
         
-        times_ms = []
-        for multiplier in [1, 2, 5]:
-            text = base_text * multiplier
-            
-            start_time = time.time()
+        # Warm up so the timed call doesn't pay first-call costs
+        self.service.detect_pii_batch([base_text])
+        
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
             entities = self.service.detect_pii(text)
-            elapsed = (time.time() - start_time) * 1000
-            
-            times_ms.append(elapsed)
-            perf_metrics.record(f"scaling_{multiplier}x", elapsed)
+            elapsed = (time.perf_counter_ns() - start_time_ns) / 1e6
         
-        logger.info(f"✓ Scaling test: 1x={times_ms[0]:.2f}ms, 2x={times_ms[1]:.2f}ms, 5x={times_ms[2]:.2f}ms")
+        perf_metrics.record(f"scaling_{multiplier}x", elapsed)
+        
+        assert isinstance(entities, list)
+        logger.info("✓ Scaling test %sx: %.2fms for %d chars, %d entities", multiplier, elapsed, len(text), len(entities))
     
-    def test_detection_throughput(self, sample_text_data):
-        """Test detection throughput (entities per second)."""
+    def test_detection_throughput(self, benchmark, sample_text_data):
+        """Test detection throughput (documents per second)."""
         text = sample_text_data["complex_text"]
         
-        start_time = time.time()
-        for _ in range(10):
-            entities = self.service.detect_pii(text)
-        elapsed = time.time() - start_time
+        benchmark.pedantic(self.service.detect_pii, args=(text,), rounds=10, warmup_rounds=2)
+        elapsed = benchmark_mean_ms(benchmark)
         
-        throughput = 10 / elapsed
-        logger.info(f"✓ Detection throughput: {throughput:.2f} documents/sec")
+        if elapsed is not None:
+            throughput = 1000 / elapsed
+            logger.info("✓ Detection throughput: %.2f documents/sec", throughput)
 
 
 class TestRedactionPerformance:
     """Performance tests for redaction."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, redaction_service):
         """Setup test fixtures."""
-        from app.services.redaction_service import RedactionService
-        self.service = RedactionService()
+        self.service = redaction_service
     
-    def test_pdf_redaction_speed(self, sample_pdf_path, sample_entities, perf_metrics, test_temp_dir):
+    def test_pdf_redaction_speed(self, benchmark, sample_pdf_path, sample_entities, perf_metrics, test_temp_dir):
         """Test PDF redaction speed."""
         output_path = os.path.join(test_temp_dir, "perf_redacted.pdf")
         
-        start_time = time.time()
-        result = self.service.redact_document(
+        result = benchmark(
+            self.service.redact_document,
             input_path=sample_pdf_path,
             output_path=output_path,
             entities=sample_entities
         )
-        elapsed = (time.time() - start_time) * 1000  # ms
+        elapsed = benchmark_mean_ms(benchmark)
         
-        perf_metrics.record("pdf_redaction", elapsed)
-        
-        logger.info(f"✓ PDF redaction: {elapsed:.2f}ms for {len(sample_entities)} entities")
+        assert os.path.exists(output_path)
+        if elapsed is not None:
+            perf_metrics.record("pdf_redaction", elapsed)
+            logger.info("✓ PDF redaction: %.2fms for %d entities", elapsed, len(sample_entities))
     
-    def test_image_redaction_speed(self, sample_image_path, sample_entities, perf_metrics, test_temp_dir):
+    def test_image_redaction_speed(self, benchmark, sample_image_path, sample_entities, perf_metrics, test_temp_dir):
         """Test image redaction speed."""
         output_path = os.path.join(test_temp_dir, "perf_redacted.png")
         
-        start_time = time.time()
-        result = self.service.redact_document(
+        result = benchmark(
+            self.service.redact_document,
             input_path=sample_image_path,
             output_path=output_path,
             entities=sample_entities,
             redaction_style='black'
         )
-        elapsed = (time.time() - start_time) * 1000  # ms
-        
-        perf_metrics.record("image_redaction", elapsed)
+        elapsed = benchmark_mean_ms(benchmark)
         
-        logger.info(f"✓ Image redaction: {elapsed:.2f}ms for {len(sample_entities)} entities")
+        assert os.path.exists(output_path)
+        if elapsed is not None:
+            perf_metrics.record("image_redaction", elapsed)
+            logger.info("✓ Image redaction: %.2fms for %d entities", elapsed, len(sample_entities))
     
     def test_redaction_memory_usage(self, sample_pdf_path, sample_entities):
         """Test memory usage during redaction."""
-        import tempfile
         
         with tempfile.TemporaryDirectory() as tmpdir:
             output_path = os.path.join(tmpdir, "redacted.pdf")
@@ -214,205 +230,235 @@ class TestRedactionPerformance:
             tracemalloc.stop()
             
             peak_mb = peak / 1024 / 1024
-            logger.info(f"✓ Redaction memory: {peak_mb:.2f}MB")
+            logger.info("✓ Redaction memory: %.2fMB", peak_mb)
     
-    def test_multiple_redactions_throughput(self, sample_pdf_path, sample_entities, perf_metrics, test_temp_dir):
+    def test_multiple_redactions_throughput(self, benchmark, sample_pdf_path, sample_entities, test_temp_dir):
         """Test throughput of multiple redactions."""
         doc_count = 5
-        times = []
-        
-        for i in range(doc_count):
-            output_path = os.path.join(test_temp_dir, f"throughput_{i}.pdf")
-            
-            start_time = time.time()
-            result = self.service.redact_document(
-                input_path=sample_pdf_path,
-                output_path=output_path,
-                entities=sample_entities
-            )
-            elapsed = (time.time() - start_time) * 1000
-            times.append(elapsed)
-        
-        avg_time = sum(times) / len(times)
-        throughput = 1000 / avg_time  # docs per second
+        # Every round overwrites the same output; only timing matters here
+        output_path = os.path.join(test_temp_dir, "throughput.pdf")
+        
+        benchmark.pedantic(
+            self.service.redact_document,
+            kwargs={
+                'input_path': sample_pdf_path,
+                'output_path': output_path,
+                'entities': sample_entities
+            },
+            rounds=doc_count,
+            warmup_rounds=1
+        )
+        avg_time = benchmark_mean_ms(benchmark)
         
-        logger.info(f"✓ Redaction throughput: {throughput:.2f} docs/sec (avg: {avg_time:.2f}ms)")
+        if avg_time is not None:
+            throughput = 1000 / avg_time  # docs per second
+            logger.info("✓ Redaction throughput: %.2f docs/sec (avg: %.2fms)", throughput, avg_time)
+    
+    @pytest.mark.benchmark(group="image_box_fill")
+    def test_image_box_fill_speed(self, benchmark, original_image_size):
+        """Test solid-fill speed for many boxes on one image."""
+        from PIL import Image
+        width, height = original_image_size
+        image = Image.new('RGB', original_image_size, color='white')
+        # A grid of small boxes, as from a dense OCR page
+        boxes = [(x, y, x + 8, y + 6) for y in range(0, height - 6, 10) for x in range(0, width - 8, 12)]
+        
+        # First call compiles the kernel
+        self.service._fill_regions(image.copy(), boxes[:1], 'black')
+        benchmark(self.service._fill_regions, image.copy(), boxes, 'black')
+        elapsed = benchmark_mean_ms(benchmark)
+        
+        if elapsed is not None:
+            logger.info("✓ Filled %d boxes in %.3fms", len(boxes), elapsed)
 
 
 class TestPipelinePerformance:
     """Performance tests for complete pipeline."""
     
-    def test_end_to_end_document_processing(self, sample_pdf_path, test_temp_dir, perf_metrics):
+    def test_end_to_end_document_processing(self, sample_pdf_path, sample_pdf_text, test_temp_dir,
+                                            perf_metrics, pii_service, redaction_service, gc_paused):
         """Test end-to-end processing performance."""
-        from app.services.pii_detection_service import PIIDetectionService
-        from app.services.redaction_service import RedactionService
-        import fitz
-        
-        # Stage 1: Text extraction
-        start = time.time()
-        doc = fitz.open(sample_pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        extract_time = (time.time() - start) * 1000
+        
+        # Stage 1: Text extraction (timed once; later stages use the cached text)
+        with gc_paused():
+            start_ns = time.perf_counter_ns()
+            with fitz.open(sample_pdf_path) as doc:
+                extracted = chr(12).join(page.get_text() for page in doc)
+            extract_time = (time.perf_counter_ns() - start_ns) / 1e6
+        
+        assert extracted == sample_pdf_text
+        text = sample_pdf_text
         
         # Stage 2: PII detection
-        detector = PIIDetectionService()
-        start = time.time()
-        entities = detector.detect_pii(text)
-        detect_time = (time.time() - start) * 1000
+        detector = pii_service
+        with gc_paused():
+            start_ns = time.perf_counter_ns()
+            entities = detector.detect_pii(text)
+            detect_time = (time.perf_counter_ns() - start_ns) / 1e6
         
         # Stage 3: Redaction
-        redactor = RedactionService()
+        redactor = redaction_service
         output_path = os.path.join(test_temp_dir, "end_to_end.pdf")
-        start = time.time()
-        result = redactor.redact_document(
-            input_path=sample_pdf_path,
-            output_path=output_path,
-            entities=entities
-        )
-        redact_time = (time.time() - start) * 1000
+        with gc_paused():
+            start_ns = time.perf_counter_ns()
+            result = redactor.redact_document(
+                input_path=sample_pdf_path,
+                output_path=output_path,
+                entities=entities
+            )
+            redact_time = (time.perf_counter_ns() - start_ns) / 1e6
         
         total_time = extract_time + detect_time + redact_time
         
-        logger.info(f"✓ End-to-end pipeline:")
-        logger.debug(f"  Extraction: {extract_time:.2f}ms")
-        logger.debug(f"  Detection: {detect_time:.2f}ms")
-        logger.debug(f"  Redaction: {redact_time:.2f}ms")
-        logger.debug(f"  Total: {total_time:.2f}ms")
+        logger.info("✓ End-to-end pipeline:")
+        logger.debug("  Extraction: %.2fms", extract_time)
+        logger.debug("  Detection: %.2fms", detect_time)
+        logger.debug("  Redaction: %.2fms", redact_time)
+        logger.debug("  Total: %.2fms", total_time)
         
         perf_metrics.record("extraction", extract_time)
         perf_metrics.record("detection", detect_time)
         perf_metrics.record("redaction", redact_time)
     
-    def test_batch_processing_performance(self, sample_pdf_path, test_temp_dir, sample_entities):
+    def test_batch_processing_performance(self, sample_pdf_path, test_temp_dir, sample_entities, redaction_service, gc_paused):
         """Test batch processing performance."""
-        from app.services.redaction_service import RedactionService
-        
-        redactor = RedactionService()
+        redactor = redaction_service
         batch_size = 10
+        # Every iteration overwrites the same output; only timing matters here
+        output_path = os.path.join(test_temp_dir, "batch.pdf")
         
-        start_time = time.time()
-        for i in range(batch_size):
-            output_path = os.path.join(test_temp_dir, f"batch_{i}.pdf")
-            redactor.redact_document(
-                input_path=sample_pdf_path,
-                output_path=output_path,
-                entities=sample_entities
-            )
-        
-        total_time = time.time() - start_time
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
+            for i in range(batch_size):
+                redactor.redact_document(
+                    input_path=sample_pdf_path,
+                    output_path=output_path,
+                    entities=sample_entities
+                )
+            
+            total_time = (time.perf_counter_ns() - start_time_ns) / 1e9
         avg_per_doc = total_time / batch_size
         throughput = batch_size / total_time
         
-        logger.info(f"✓ Batch processing ({batch_size} docs):")
-        logger.debug(f"  Total time: {total_time:.2f}s")
-        logger.debug(f"  Per doc: {avg_per_doc:.2f}s")
-        logger.debug(f"  Throughput: {throughput:.2f} docs/sec")
+        logger.info("✓ Batch processing (%s docs):", batch_size)
+        logger.debug("  Total time: %.2fs", total_time)
+        logger.debug("  Per doc: %.2fs", avg_per_doc)
+        logger.debug("  Throughput: %.2f docs/sec", throughput)
 
 
 class TestResourceUtilization:
     """Test system resource utilization."""
     
-    def test_cpu_usage_during_detection(self, sample_text_data):
+    def test_cpu_usage_during_detection(self, sample_text_data, pii_service):
         """Test CPU usage during PII detection."""
-        from app.services.pii_detection_service import PIIDetectionService
-        
-        service = PIIDetectionService()
+        service = pii_service
         text = sample_text_data["complex_text"] * 3
         
+        # CPU time attributed to the detection call only, no sampling sleeps
         process = psutil.Process()
-        cpu_percent_start = process.cpu_percent(interval=0.1)
+        cpu_start = process.cpu_times()
+        wall_start_ns = time.perf_counter_ns()
         
         entities = service.detect_pii(text)
         
-        cpu_percent_end = process.cpu_percent(interval=0.1)
+        wall_seconds = (time.perf_counter_ns() - wall_start_ns) / 1e9
+        cpu_end = process.cpu_times()
+        cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+        cpu_percent = cpu_seconds / wall_seconds * 100 if wall_seconds > 0 else 0
         
-        logger.info(f"✓ CPU usage: start={cpu_percent_start:.1f}%, end={cpu_percent_end:.1f}%")
+        logger.info("✓ CPU usage: %.1fms CPU over %.1fms wall (%.1f%%)", cpu_seconds * 1000, wall_seconds * 1000, cpu_percent)
     
-    def test_memory_efficiency(self, sample_text_data):
+    def test_memory_efficiency(self, sample_text_data, pii_service):
         """Test memory efficiency."""
-        from app.services.pii_detection_service import PIIDetectionService
-        
-        service = PIIDetectionService()
+        service = pii_service
         
-        # Test with progressively larger inputs
+        # Test with progressively larger inputs, tracing once for the whole loop
         sizes = []
-        for multiplier in [1, 2, 5, 10]:
-            text = sample_text_data["complex_text"] * multiplier
-            
-            tracemalloc.start()
-            entities = service.detect_pii(text)
-            current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.start(1)
+        try:
+            for multiplier in [1, 2, 5, 10]:
+                text = sample_text_data["complex_text"] * multiplier
+                
+                before = tracemalloc.take_snapshot()
+                baseline, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                entities = service.detect_pii(text)
+                _, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot()
+                
+                retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+                peak_mb = (peak - baseline) / 1024 / 1024
+                ratio = peak_mb / (len(text) / 1024 / 1024) if len(text) > 0 else 0
+                
+                sizes.append({
+                    'text_size_mb': len(text) / 1024 / 1024,
+                    'peak_memory_mb': peak_mb,
+                    'retained_mb': retained / 1024 / 1024,
+                    'ratio': ratio
+                })
+        finally:
             tracemalloc.stop()
-            
-            peak_mb = peak / 1024 / 1024
-            ratio = peak_mb / (len(text) / 1024 / 1024) if len(text) > 0 else 0
-            
-            sizes.append({
-                'text_size_mb': len(text) / 1024 / 1024,
-                'peak_memory_mb': peak_mb,
-                'ratio': ratio
-            })
         
         logger.info("✓ Memory efficiency test:")
         for i, s in enumerate(sizes):
-            logger.debug(f"  Input: {s['text_size_mb']:.2f}MB -> Peak: {s['peak_memory_mb']:.2f}MB (ratio: {s['ratio']:.2f}x)")
+            logger.debug("  Input: %.2fMB -> Peak: %.2fMB, Retained: %.2fMB (ratio: %.2fx)",
+                         s['text_size_mb'], s['peak_memory_mb'], s['retained_mb'], s['ratio'])
 
 
 class TestLoadTesting:
     """Load and stress tests."""
     
-    def test_concurrent_detection_simulation(self, sample_text_data):
+    def test_concurrent_detection_simulation(self, sample_text_data, pii_service, gc_paused):
         """Simulate concurrent detection requests."""
-        from app.services.pii_detection_service import PIIDetectionService
-        
-        service = PIIDetectionService()
+        service = pii_service
         text = sample_text_data["mixed_pii_text"]
         
         concurrent_requests = 20
-        start_time = time.time()
-        
-        for _ in range(concurrent_requests):
-            entities = service.detect_pii(text)
-        
-        elapsed = time.time() - start_time
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
+            
+            for _ in range(concurrent_requests):
+                entities = service.detect_pii(text)
+            
+            elapsed = (time.perf_counter_ns() - start_time_ns) / 1e9
         rate = concurrent_requests / elapsed
         
-        logger.info(f"✓ Concurrent detection simulation:")
-        logger.debug(f"  Requests: {concurrent_requests}")
-        logger.debug(f"  Total time: {elapsed:.2f}s")
-        logger.debug(f"  Rate: {rate:.2f} req/s")
+        logger.info("✓ Concurrent detection simulation:")
+        logger.debug("  Requests: %s", concurrent_requests)
+        logger.debug("  Total time: %.2fs", elapsed)
+        logger.debug("  Rate: %.2f req/s", rate)
     
-    def test_large_batch_redaction(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_large_batch_redaction(self, sample_pdf_path, sample_entities, test_temp_dir, redaction_pool, gc_paused):
         """Test processing large batch of documents."""
-        from app.services.redaction_service import RedactionService
-        
-        redactor = RedactionService()
         batch_count = 5
         
-        start_time = time.time()
         success_count = 0
         
-        for i in range(batch_count):
-            try:
-                output_path = os.path.join(test_temp_dir, f"large_batch_{i}.pdf")
-                redactor.redact_document(
+        # PyMuPDF is not thread-safe, so fan out across the (already started) worker processes
+        with gc_paused():
+            start_time_ns = time.perf_counter_ns()
+            futures = {
+                redaction_pool.submit(
+                    redaction_worker.redact_document,
                     input_path=sample_pdf_path,
-                    output_path=output_path,
+                    output_path=os.path.join(test_temp_dir, f"large_batch_{i}.pdf"),
                     entities=sample_entities
-                )
-                success_count += 1
-            except Exception as e:
-                logger.warning(f"ℹ Batch item {i} failed: {e}")
-        
-        elapsed = time.time() - start_time
+                ): i
+                for i in range(batch_count)
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    success_count += 1
+                except Exception as e:
+                    logger.warning("ℹ Batch item %s failed: %s", futures[future], e)
+            
+            elapsed = (time.perf_counter_ns() - start_time_ns) / 1e9
         
-        logger.info(f"✓ Large batch processing:")
-        logger.debug(f"  Completed: {success_count}/{batch_count}")
-        logger.debug(f"  Total time: {elapsed:.2f}s")
-        logger.debug(f"  Rate: {success_count/elapsed:.2f} docs/s")
+        logger.info("✓ Large batch processing:")
+        logger.debug("  Completed: %s/%s", success_count, batch_count)
+        logger.debug("  Total time: %.2fs", elapsed)
+        logger.debug("  Rate: %.2f docs/s", success_count/elapsed)
 
 
 if __name__ == "__main__":
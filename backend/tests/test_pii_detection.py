@@ -4,34 +4,80 @@ Tests core PII detection functionality using various detection methods.
 """
 
 import pytest
+import re
 import sys
 import os
+import time
+import numpy as np
+from functools import lru_cache
+from statistics import fmean
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.config import settings
 from app.services.pii_detection_service import PIIDetectionService
+from app.services.service_cache import get_service
+from app.services.fast_ssn import scan_ssn, scan_ssn_text
 from typing import List, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+pytestmark = pytest.mark.unit
+
 
 class TestPIIDetectionServiceBasic:
     """Test basic PII detection functionality."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, pii_service):
         """Setup test fixtures."""
-        self.service = PIIDetectionService()
+        self.service = pii_service
     
     def test_service_initialization(self):
         """Test that PIIDetectionService initializes correctly."""
         assert self.service is not None
-        assert self.service.spacy_model_name == "en_core_web_sm"
+        # The default small model, or whichever model SPACY_MODEL selects
+        assert self.service.spacy_model_name in {"en_core_web_sm", settings.SPACY_MODEL}
         logger.info("✓ Service initialization successful")
     
-    def test_detect_simple_pii(self, sample_text_data):
+    @pytest.mark.slow
+    @pytest.mark.requires_model
+    def test_minimal_pipeline_keeps_ner(self):
+        """Test that the trimmed spaCy pipeline still produces NER labels."""
+        minimal = get_service(minimal_pipeline=True)
+        if minimal.nlp is None:
+            pytest.skip("spaCy model not installed")
+        
+        assert minimal.nlp.pipe_names == ["ner"]
+        
+        doc = minimal.nlp("John Smith joined Google in London on Monday")
+        labels = {ent.label_ for ent in doc.ents}
+        assert labels & {"PERSON", "ORG", "GPE", "DATE"}
+        
+        logger.info(f"✓ Minimal pipeline NER labels: {labels}")
+    
+    @pytest.mark.slow
+    @pytest.mark.requires_model
+    def test_pipeline_variants_agree(self, sample_text_data):
+        """Test that the NER-only pipeline finds the same entities as the full one."""
+        if self.service.nlp is None:
+            pytest.skip("spaCy model not installed")
+        minimal = get_service(minimal_pipeline=True)
+        
+        text = sample_text_data["complex_text"]
+        reference = self.service.detect_pii(text)
+        
+        start = time.perf_counter()
+        entities = minimal.detect_pii(text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        assert len(entities) == len(reference)
+        assert sorted(e["label"] for e in entities) == sorted(e["label"] for e in reference)
+        
+        logger.info(f"✓ Minimal pipeline agrees with full: {len(entities)} entities in {elapsed_ms:.2f}ms")
+    
+    def test_detect_simple_pii(self, detections):
         """Test detection of simple PII in straightforward text."""
-        text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         assert entities is not None
         assert isinstance(entities, list)
@@ -44,10 +90,9 @@ class TestPIIDetectionServiceBasic:
         logger.info(f"✓ Detected {len(entities)} entities in simple text")
         logger.debug(f"  Entity types: {set(entity_labels)}")
     
-    def test_detect_email_addresses(self, sample_text_data):
+    def test_detect_email_addresses(self, detections):
         """Test detection of email addresses."""
-        text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         emails = [e for e in entities if e.get("label") == "EMAIL"]
         assert len(emails) > 0, "Should detect email addresses"
@@ -56,10 +101,9 @@ class TestPIIDetectionServiceBasic:
         for email in emails:
             logger.debug(f"  Email: {email['text']}")
     
-    def test_detect_ssn(self, sample_text_data):
+    def test_detect_ssn(self, detections):
         """Test detection of Social Security Numbers."""
-        text = sample_text_data["ssn_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["ssn_text"]
         
         ssns = [e for e in entities if e.get("label") == "SSN"]
         assert len(ssns) > 0, "Should detect SSNs"
@@ -68,10 +112,9 @@ class TestPIIDetectionServiceBasic:
         for ssn in ssns:
             logger.debug(f"  SSN: {ssn['text']}")
     
-    def test_detect_phone_numbers(self, sample_text_data):
+    def test_detect_phone_numbers(self, detections):
         """Test detection of phone numbers."""
-        text = sample_text_data["phone_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["phone_text"]
         
         phones = [e for e in entities if e.get("label") == "PHONE"]
         assert len(phones) > 0, "Should detect phone numbers"
@@ -80,19 +123,17 @@ class TestPIIDetectionServiceBasic:
         for phone in phones:
             logger.debug(f"  Phone: {phone['text']}")
     
-    def test_no_false_positives_on_clean_text(self, sample_text_data):
+    def test_no_false_positives_on_clean_text(self, detections):
         """Test that clean text doesn't trigger false positives."""
-        text = sample_text_data["no_pii_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["no_pii_text"]
         
         # Allow some minor detections but should be minimal
         logger.info(f"ℹ Detected {len(entities)} entities in clean text")
         logger.debug(f"  (Acceptable if confidence is very low)")
     
-    def test_complex_document_detection(self, sample_text_data):
+    def test_complex_document_detection(self, detections):
         """Test detection in complex document with multiple PII types."""
-        text = sample_text_data["complex_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["complex_text"]
         
         assert len(entities) > 0, "Should detect entities in complex document"
         
@@ -119,10 +160,9 @@ class TestPIIDetectionServiceBasic:
         logger.debug(f"  High threshold (0.95): {len(high_confidence)} entities")
         logger.debug(f"  Low threshold (0.5): {len(low_confidence)} entities")
     
-    def test_entity_structure(self, sample_text_data):
+    def test_entity_structure(self, detections):
         """Test that detected entities have proper structure."""
-        text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         for entity in entities:
             # Check required fields
@@ -147,26 +187,29 @@ class TestPIIDetectionServiceBasic:
         
         logger.info("✓ Empty text handled correctly")
     
+    @pytest.mark.slow
     def test_very_long_text_handling(self, sample_text_data):
         """Test handling of very long text."""
         # Create a long text by repeating content
         long_text = (sample_text_data["complex_text"] * 10)
         
+        start = time.perf_counter()
         entities = self.service.detect_pii(long_text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
         
         assert entities is not None
         assert isinstance(entities, list)
         
-        logger.info(f"✓ Long text handled: {len(long_text)} chars -> {len(entities)} entities")
+        logger.info(f"✓ Long text handled: {len(long_text)} chars -> {len(entities)} entities in {elapsed_ms:.2f}ms")
 
 
 class TestPIIDetectionServiceAdvanced:
     """Test advanced PII detection features."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, pii_service):
         """Setup test fixtures."""
-        self.service = PIIDetectionService()
+        self.service = pii_service
     
     def test_regex_fallback_detection(self, pii_patterns):
         """Test that regex patterns work as fallback."""
@@ -178,6 +221,38 @@ class TestPIIDetectionServiceAdvanced:
         
         logger.info(f"✓ Regex fallback detection working for emails")
     
+    def test_regex_patterns_compiled_once(self):
+        """Test that regex patterns are shared class-level compiled objects."""
+        other = PIIDetectionService.__new__(PIIDetectionService)
+        
+        assert self.service.EMAIL_RE is other.EMAIL_RE
+        assert self.service.SSN_RE is PIIDetectionService.SSN_RE
+        assert all(isinstance(pattern, re.Pattern) for pattern, _ in PIIDetectionService.PHONE_PATTERNS)
+        
+        logger.info("✓ Regex patterns compiled once per class")
+    
+    def test_detect_cache_reuses_results(self, sample_text_data, monkeypatch):
+        """Test that the opt-in detection cache serves repeats without sharing entity dicts."""
+        # Turn the cache on for the session service rather than loading another one
+        service = self.service
+        monkeypatch.setattr(service, "_detect_cached",
+                            lru_cache(maxsize=service.DETECT_CACHE_SIZE)(service._detect_frozen))
+        text = sample_text_data["simple_text"]
+        
+        first = service.detect_pii(text)
+        second = service.detect_pii(text)
+        
+        assert service._detect_cached(text, 0.85) is service._detect_cached(text, 0.85)
+        assert service._detect_cached.cache_info().misses == 1
+        
+        def without_ids(entities):
+            return [{k: v for k, v in e.items() if k != 'id'} for e in entities]
+        
+        assert without_ids(first) == without_ids(second)
+        assert all(a is not b and a['id'] != b['id'] for a, b in zip(first, second))
+        
+        logger.info(f"✓ Detection cache hits: {service._detect_cached.cache_info().hits}")
+    
     def test_overlapping_entity_merging(self):
         """Test that overlapping entities are properly merged."""
         text = "John Doe is a person named John Doe living in New York"
@@ -188,10 +263,9 @@ class TestPIIDetectionServiceAdvanced:
         
         logger.info(f"✓ Overlapping entities handled: {len(entities)} merged entities")
     
-    def test_deduplication(self, sample_text_data):
+    def test_deduplication(self, detections):
         """Test that duplicate entities are removed."""
-        text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         # Check for duplicates
         entity_texts = [e["text"] for e in entities]
@@ -199,10 +273,33 @@ class TestPIIDetectionServiceAdvanced:
         
         logger.info(f"✓ Deduplication working: {len(entities)} unique entities")
     
-    def test_multiple_pii_types_in_single_doc(self, sample_text_data):
+    def test_batch_detection_matches_single(self, sample_text_data):
+        """Test that batched detection returns the same entities as per-text calls."""
+        texts = list(sample_text_data.values())
+        batched = self.service.detect_pii_batch(texts)
+        
+        def without_ids(entities):
+            return [{k: v for k, v in e.items() if k != 'id'} for e in entities]
+        
+        assert len(batched) == len(texts)
+        for text, entities in zip(texts, batched):
+            assert without_ids(entities) == without_ids(self.service.detect_pii(text))
+        
+        logger.info(f"✓ Batched detection matches single-text detection for {len(texts)} texts")
+    
+    def test_group_by_label(self, sample_entities, sample_entities_by_label):
+        """Test that entities are grouped by label in one pass."""
+        groups = sample_entities_by_label
+        
+        assert set(groups) == {e["label"] for e in sample_entities}
+        assert sum(len(group) for group in groups.values()) == len(sample_entities)
+        assert groups["PHONE"] == []
+        
+        logger.info(f"✓ Grouped {len(sample_entities)} entities into {len(groups)} labels")
+    
+    def test_multiple_pii_types_in_single_doc(self, detections):
         """Test detection of multiple PII types in one document."""
-        text = sample_text_data["mixed_pii_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["mixed_pii_text"]
         
         entity_labels = set(e.get("label") for e in entities)
         
@@ -211,10 +308,10 @@ class TestPIIDetectionServiceAdvanced:
         
         logger.info(f"✓ Multiple PII types detected: {entity_labels}")
     
-    def test_entity_position_tracking(self, sample_text_data):
+    def test_entity_position_tracking(self, sample_text_data, detections):
         """Test that entity positions are tracked correctly."""
         text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         for entity in entities:
             if "start" in entity and "end" in entity:
@@ -226,13 +323,14 @@ class TestPIIDetectionServiceAdvanced:
         logger.info(f"✓ Entity positions correctly tracked")
 
 
+@pytest.mark.slow
 class TestPIIDetectionAccuracy:
     """Test accuracy and precision of PII detection."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, pii_service):
         """Setup test fixtures."""
-        self.service = PIIDetectionService()
+        self.service = pii_service
     
     def test_precision(self, sample_text_data):
         """Test precision of detection (no false positives)."""
@@ -255,17 +353,16 @@ class TestPIIDetectionAccuracy:
         
         logger.info(f"✓ Recall test: detected {len(entities)} entities with low threshold")
     
-    def test_confidence_calibration(self, sample_text_data):
+    def test_confidence_calibration(self, detections):
         """Test that confidence scores are properly calibrated."""
-        text = sample_text_data["simple_text"]
-        entities = self.service.detect_pii(text)
+        entities = detections["simple_text"]
         
         confidence_scores = [e.get("confidence", 0) for e in entities]
         
         assert len(confidence_scores) > 0
         assert all(0 <= score <= 1 for score in confidence_scores)
         
-        avg_confidence = sum(confidence_scores) / len(confidence_scores)
+        avg_confidence = fmean(confidence_scores)
         logger.info(f"✓ Confidence scores: avg={avg_confidence:.2f}, range=[{min(confidence_scores):.2f}, {max(confidence_scores):.2f}]")
 
 
@@ -273,9 +370,9 @@ class TestPIIDetectionEdgeCases:
     """Test edge cases and error handling."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, pii_service):
         """Setup test fixtures."""
-        self.service = PIIDetectionService()
+        self.service = pii_service
     
     def test_special_characters_in_pii(self):
         """Test handling of special characters in PII."""
@@ -317,5 +414,71 @@ class TestPIIDetectionEdgeCases:
         logger.info(f"✓ Case sensitivity: lower={len(emails_lower)}, upper={len(emails_upper)}")
 
 
+class TestFastSSNScanner:
+    """Test the compiled SSN byte scanner."""
+    
+    def test_scanner_matches_regex(self, sample_text_data, sample_text_bytes):
+        """Test that the scanner finds the same SSNs as the service regex."""
+        
+        for key, text in sample_text_data.items():
+            expected = [m.span() for m in re.finditer(r'\b\d{3}-\d{2}-\d{4}\b', text)]
+            assert scan_ssn_text(text) == expected
+            assert scan_ssn(np.frombuffer(sample_text_bytes[key], dtype=np.uint8)) == expected
+        
+        logger.info("✓ SSN scanner agrees with regex on all sample texts")
+    
+    def test_scanner_respects_word_boundaries(self):
+        """Test that SSN-shaped substrings of longer tokens are ignored."""
+        assert scan_ssn_text("x123-45-6789") == []
+        assert scan_ssn_text("123-45-67890") == []
+        assert scan_ssn_text("") == []
+        
+        logger.info("✓ SSN scanner word boundaries respected")
+    
+    def test_scanner_unicode_boundaries_match_regex(self):
+        """Test that non-ASCII neighbours follow re's Unicode \\b: punctuation is a boundary, letters aren't."""
+        texts = ["SSN:\u00a0123-45-6789", "123-45-6789\u2014on file", "\u00e9123-45-6789", "123-45-6789\u00fc"]
+        
+        for text in texts:
+            data = text.encode('utf-8')
+            found = [data[start:end].decode('utf-8') for start, end in scan_ssn_text(text)]
+            assert found == re.findall(r'\b\d{3}-\d{2}-\d{4}\b', text), text
+        
+        logger.info("✓ SSN scanner agrees with regex next to non-ASCII characters")
+
+
+class TestPIIPatternSafety:
+    """Test that the PII regex patterns are safe on adversarial input."""
+    
+    @pytest.mark.redos
+    def test_patterns_linear_time_on_adversarial_input(self, pii_patterns):
+        """Test that patterns complete quickly where backtracking would blow up."""
+        pytest.importorskip("re2")
+        adversarial = "a" * 100_000 + "!"
+        
+        for name, pattern in pii_patterns.items():
+            start = time.perf_counter()
+            pattern.search(adversarial)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            assert elapsed_ms < 10, f"Pattern '{name}' took {elapsed_ms:.2f}ms"
+        
+        logger.info(f"✓ All {len(pii_patterns)} patterns matched adversarial input in linear time")
+    
+    def test_union_scan_matches_individual_patterns(self, pii_patterns, pii_scanner, sample_text_data):
+        """Test that the single-pass union scan finds what each pattern finds."""
+        text = sample_text_data["complex_text"]
+        
+        expected = sorted(
+            (name, m.start(), m.end(), m.group())
+            for name, pattern in pii_patterns.items()
+            for m in pattern.finditer(text)
+        )
+        
+        assert sorted(pii_scanner(text)) == expected
+        
+        logger.info(f"✓ Union scan found {len(expected)} matches in one pass")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
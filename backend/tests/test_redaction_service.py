@@ -8,19 +8,23 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from pathlib import Path
-from app.services.redaction_service import RedactionService
+import fitz
+from PIL import Image
+from app.services.redaction_service import RedactionService, _dedupe_overlaps
 import logging
 
 logger = logging.getLogger(__name__)
 
+pytestmark = pytest.mark.unit
+
 
 class TestRedactionServiceBasic:
     """Test basic redaction functionality."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
     def test_service_initialization(self):
         """Test that RedactionService initializes correctly."""
@@ -82,11 +86,51 @@ class TestRedactionServiceBasic:
         logger.info(f"✓ Image redaction successful")
         logger.debug(f"  Output path: {output_path}")
     
-    def test_redaction_output_exists(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_incremental_save_appends_to_input(self, incremental_redaction_service, sample_pdf_bytes,
+                                                sample_entities, original_pdf_page_count, test_temp_dir):
+        """Test that incremental mode appends redactions after the original bytes."""
+        output_path = os.path.join(test_temp_dir, "incremental.pdf")
+        
+        result = incremental_redaction_service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
+            output_path=output_path,
+            entities=sample_entities
+        )
+        
+        output = Path(output_path).read_bytes()
+        assert result['redacted_entities'] > 0
+        assert output.startswith(sample_pdf_bytes) and len(output) > len(sample_pdf_bytes)
+        with fitz.open(output_path) as doc:
+            assert doc.page_count == original_pdf_page_count
+        
+        logger.info(f"✓ Incremental save appended {len(output) - len(sample_pdf_bytes)} bytes")
+    
+    def test_redaction_from_bytes_matches_path(self, sample_pdf_path, sample_pdf_bytes, sample_entities, test_temp_dir):
+        """Test that in-memory redaction gives the same result as redacting from disk."""
+        from_path = self.service.redact_document(
+            input_path=sample_pdf_path,
+            output_path=os.path.join(test_temp_dir, "from_path.pdf"),
+            entities=sample_entities
+        )
+        from_bytes = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
+            output_path=os.path.join(test_temp_dir, "from_bytes.pdf"),
+            entities=sample_entities
+        )
+        
+        assert from_bytes['redacted_entities'] == from_path['redacted_entities']
+        assert from_bytes['total_entities'] == from_path['total_entities']
+        assert os.path.exists(from_bytes['output_path'])
+        
+        logger.info("✓ In-memory redaction matches on-disk redaction")
+    
+    def test_redaction_output_exists(self, incremental_redaction_service, sample_pdf_path, sample_entities, test_temp_dir):
         """Test that redacted output file is created."""
         output_path = os.path.join(test_temp_dir, "output.pdf")
         
-        self.service.redact_document(
+        incremental_redaction_service.redact_document(
             input_path=sample_pdf_path,
             output_path=output_path,
             entities=sample_entities
@@ -98,20 +142,22 @@ class TestRedactionServiceBasic:
         logger.info(f"✓ Output file created with size: {os.path.getsize(output_path)} bytes")
 
 
+@pytest.mark.redaction
 class TestRedactionStyles:
     """Test different redaction styles."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
-    def test_black_redaction_style(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_black_redaction_style(self, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test black box redaction style."""
         output_path = os.path.join(test_temp_dir, "redacted_black.pdf")
         
-        result = self.service.redact_document(
-            input_path=sample_pdf_path,
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
             output_path=output_path,
             entities=sample_entities,
             redaction_style='black'
@@ -140,12 +186,13 @@ class TestRedactionStyles:
         
         logger.info("✓ Blur redaction style applied successfully")
     
-    def test_white_redaction_style(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_white_redaction_style(self, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test white box redaction style."""
         output_path = os.path.join(test_temp_dir, "redacted_white.pdf")
         
-        result = self.service.redact_document(
-            input_path=sample_pdf_path,
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
             output_path=output_path,
             entities=sample_entities,
             redaction_style='white'
@@ -176,16 +223,17 @@ class TestRedactionAccuracy:
     """Test accuracy of redaction operations."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
-    def test_all_entities_redacted(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_all_entities_redacted(self, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test that all provided entities are redacted."""
         output_path = os.path.join(test_temp_dir, "fully_redacted.pdf")
         
-        result = self.service.redact_document(
-            input_path=sample_pdf_path,
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
             output_path=output_path,
             entities=sample_entities
         )
@@ -199,11 +247,145 @@ class TestRedactionAccuracy:
         
         logger.info(f"✓ Redacted {redacted_entities}/{total_entities} entities")
     
-    def test_empty_entity_list(self, sample_pdf_path, test_temp_dir):
+    def test_duplicate_entities_deduplicated(self, sample_pdf_bytes, sample_entities, test_temp_dir):
+        """Test that repeated and contained entities are merged before redaction."""
+        duplicated = sample_entities + [dict(e) for e in sample_entities]
+        output_path = os.path.join(test_temp_dir, "deduplicated.pdf")
+        
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
+            output_path=output_path,
+            entities=duplicated
+        )
+        single = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
+            output_path=os.path.join(test_temp_dir, "single.pdf"),
+            entities=sample_entities
+        )
+        
+        # total_entities is the input count; the duplicates collapse in unique_entities
+        assert result['total_entities'] == len(duplicated)
+        assert result['unique_entities'] == single['unique_entities']
+        assert result['redacted_entities'] == single['redacted_entities']
+        
+        logger.info(f"✓ Duplicates merged: {result['redacted_entities']} redactions for {len(duplicated)} entities")
+    
+    @pytest.mark.parametrize("fill", ['black', 'white'])
+    def test_fill_regions_matches_imagedraw(self, fill):
+        """Test that the array box fill paints exactly what ImageDraw.rectangle would."""
+        from PIL import ImageDraw
+        image = Image.new('RGB', (120, 100), color=(40, 120, 200))
+        boxes = [(10, 10, 50, 40), (0, 0, 0, 0), (100, 90, 200, 300), (5.4, 6.6, 20.2, 30.7)]
+        
+        expected = image.copy()
+        draw = ImageDraw.Draw(expected)
+        for coords in boxes:
+            draw.rectangle(coords, fill=fill)
+        
+        filled = self.service._fill_regions(image.copy(), boxes, fill)
+        
+        assert filled.tobytes() == expected.tobytes()
+        logger.info(f"✓ Array fill matches ImageDraw for {fill} boxes")
+    
+    def test_blur_regions_matches_whole_image_blur(self):
+        """Test that blurring around the boxes only matches a whole-image blur inside them, keeping metadata."""
+        import cv2
+        import numpy as np
+        rng = np.random.default_rng(0)
+        image = Image.fromarray(rng.integers(0, 256, (200, 300, 3), dtype=np.uint8), mode='RGB')
+        image.info['dpi'] = (300, 300)
+        boxes = [(20, 30, 60, 50), (250, 170, 320, 220)]
+        
+        blurred = self.service._blur_regions(image, boxes, 5)
+        
+        arr = np.asarray(image)
+        expected = arr.copy()
+        whole = cv2.GaussianBlur(arr, (0, 0), sigmaX=5)
+        expected[30:50, 20:60] = whole[30:50, 20:60]
+        expected[170:200, 250:300] = whole[170:200, 250:300]
+        
+        assert np.array_equal(np.asarray(blurred), expected)
+        assert blurred.info['dpi'] == (300, 300)
+        logger.info("✓ Region blur matches whole-image blur")
+    
+    def test_dedupe_overlaps(self):
+        """Test that boxes inside another box on the same page are dropped."""
+        entities = [
+            {"text": "a", "bbox": [0, 0, 100, 50]},
+            {"text": "b", "bbox": {"x": 10, "y": 10, "width": 20, "height": 20}},
+            {"text": "c", "bbox": [10, 10, 30, 30], "page": 1},
+            {"text": "d", "bbox": [90, 40, 120, 60]},
+            {"text": "John Doe"},
+            {"text": "John Doe"},
+        ]
+        
+        kept = [e["text"] for e in _dedupe_overlaps(entities)]
+        
+        assert kept == ["a", "c", "d", "John Doe"]
+        logger.info("✓ Contained boxes and repeated texts dropped")
+    
+    def test_pdf_contained_entity_still_redacted_elsewhere(self, test_temp_dir):
+        """Test that a PDF entity inside another one's box still redacts its text elsewhere."""
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "Contact John Doe for details.")
+        page.insert_text((72, 144), "John called back later.")
+        data = doc.tobytes()
+        doc.close()
+        
+        # "John" lies inside "John Doe", but PDFs are redacted by text search
+        entities = [
+            {"text": "John Doe", "label": "PERSON", "bbox": [100, 60, 160, 76], "page": 0},
+            {"text": "John", "label": "PERSON", "bbox": [100, 60, 125, 76], "page": 0},
+            {"text": "John Doe", "label": "PERSON", "bbox": [100, 60, 160, 76], "page": 0},
+        ]
+        result = self.service.redact_document_from_bytes(
+            data=data,
+            file_ext='.pdf',
+            output_path=os.path.join(test_temp_dir, "contained.pdf"),
+            entities=entities
+        )
+        
+        # "John Doe" once, "John" inside it and on its own; the repeat is dropped
+        assert result['redacted_entities'] == 3
+        assert result['total_entities'] == 3
+        assert result['unique_entities'] == 2
+        
+        logger.info("✓ Contained entity redacted everywhere its text occurs")
+    
+    def test_malformed_entities_still_redacted(self, sample_image_bytes, test_temp_dir):
+        """Test that entities with missing pages or texts don't stop the valid boxes being redacted."""
+        entities = [
+            {"text": "a", "bbox": [0, 0, 10, 10], "page": None},
+            {"text": "b", "bbox": [20, 20, 30, 30], "page": 1},
+            {"text": None, "page": 0},
+        ]
+        output_path = os.path.join(test_temp_dir, "malformed.png")
+        
+        result = self.service.redact_document_from_bytes(
+            data=sample_image_bytes,
+            file_ext='.png',
+            output_path=output_path,
+            entities=entities
+        )
+        
+        assert 'error' not in result
+        assert result['redacted_entities'] == 2
+        assert result['total_entities'] == 3
+        with Image.open(output_path) as redacted:
+            redacted = redacted.convert('RGB')
+            assert redacted.getpixel((5, 5)) == (0, 0, 0)
+            assert redacted.getpixel((25, 25)) == (0, 0, 0)
+        
+        logger.info("✓ Valid boxes redacted alongside malformed entities")
+    
+    def test_empty_entity_list(self, incremental_redaction_service, sample_pdf_path, test_temp_dir):
         """Test redaction with no entities."""
         output_path = os.path.join(test_temp_dir, "no_redaction.pdf")
         
-        result = self.service.redact_document(
+        result = incremental_redaction_service.redact_document(
             input_path=sample_pdf_path,
             output_path=output_path,
             entities=[]
@@ -211,15 +393,18 @@ class TestRedactionAccuracy:
         
         assert result is not None
         assert result.get('total_entities') == 0
+        assert result.get('unique_redacted') == 0
+        assert Path(output_path).read_bytes() == Path(sample_pdf_path).read_bytes()
         
         logger.info("✓ Empty entity list handled correctly")
     
-    def test_redaction_result_structure(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_redaction_result_structure(self, incremental_redaction_service, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test that redaction result has expected structure."""
         output_path = os.path.join(test_temp_dir, "result_test.pdf")
         
-        result = self.service.redact_document(
-            input_path=sample_pdf_path,
+        result = incremental_redaction_service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
             output_path=output_path,
             entities=sample_entities
         )
@@ -232,12 +417,13 @@ class TestRedactionAccuracy:
         
         logger.info(f"✓ Result structure valid with all required fields")
     
-    def test_redaction_statistics(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_redaction_statistics(self, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test that redaction statistics are recorded accurately."""
         output_path = os.path.join(test_temp_dir, "stats_test.pdf")
         
-        result = self.service.redact_document(
-            input_path=sample_pdf_path,
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
             output_path=output_path,
             entities=sample_entities
         )
@@ -255,62 +441,51 @@ class TestRedactionLayoutPreservation:
     """Test that redaction preserves document layout."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
-    def test_pdf_page_count_preserved(self, sample_pdf_path, sample_entities, test_temp_dir):
+    def test_pdf_page_count_preserved(self, sample_pdf_path, original_pdf_page_count, sample_entities, test_temp_dir):
         """Test that PDF page count is preserved after redaction."""
         output_path = os.path.join(test_temp_dir, "pages_preserved.pdf")
         
-        import fitz
-        original_doc = fitz.open(sample_pdf_path)
-        original_pages = len(original_doc)
-        original_doc.close()
-        
         self.service.redact_document(
             input_path=sample_pdf_path,
             output_path=output_path,
             entities=sample_entities
         )
         
-        redacted_doc = fitz.open(output_path)
-        redacted_pages = len(redacted_doc)
-        redacted_doc.close()
+        with fitz.open(output_path) as redacted_doc:
+            redacted_pages = redacted_doc.page_count
         
-        assert redacted_pages == original_pages
-        logger.info(f"✓ Page count preserved: {original_pages} pages")
+        assert redacted_pages == original_pdf_page_count
+        logger.info(f"✓ Page count preserved: {original_pdf_page_count} pages")
     
-    def test_image_dimensions_preserved(self, sample_image_path, sample_entities, test_temp_dir):
+    def test_image_dimensions_preserved(self, sample_image_path, original_image_size, sample_entities, test_temp_dir):
         """Test that image dimensions are preserved after redaction."""
         output_path = os.path.join(test_temp_dir, "dimensions_preserved.png")
         
-        from PIL import Image
-        original_img = Image.open(sample_image_path)
-        original_size = original_img.size
-        original_img.close()
-        
         self.service.redact_document(
             input_path=sample_image_path,
             output_path=output_path,
             entities=sample_entities
         )
         
-        redacted_img = Image.open(output_path)
-        redacted_size = redacted_img.size
-        redacted_img.close()
+        # Header only: PIL doesn't decode pixels until load()
+        with Image.open(output_path) as redacted_img:
+            redacted_size = redacted_img.size
         
-        assert redacted_size == original_size
-        logger.info(f"✓ Image dimensions preserved: {original_size}")
+        assert redacted_size == original_image_size
+        logger.info(f"✓ Image dimensions preserved: {original_image_size}")
 
 
 class TestRedactionErrorHandling:
     """Test error handling in redaction service."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
     def test_missing_input_file(self, test_temp_dir, sample_entities):
         """Test handling of missing input file."""
@@ -361,44 +536,86 @@ class TestRedactionErrorHandling:
             logger.info(f"✓ Invalid output path error: {type(e).__name__}")
 
 
+@pytest.mark.redaction
 class TestRedactionConfiguration:
     """Test redaction configuration and parameters."""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, fast_redaction_service):
         """Setup test fixtures."""
-        self.service = RedactionService()
+        self.service = fast_redaction_service
     
-    def test_redaction_style_parameter(self, sample_pdf_path, sample_entities, test_temp_dir):
+    @pytest.mark.parametrize("style", ['black', 'blur', 'white'])
+    def test_redaction_style_parameter(self, style, sample_pdf_bytes, sample_entities, test_temp_dir):
         """Test that redaction style parameter is respected."""
-        for style in ['black', 'blur', 'white']:
-            output_path = os.path.join(test_temp_dir, f"redacted_{style}.pdf")
-            
-            result = self.service.redact_document(
-                input_path=sample_pdf_path,
-                output_path=output_path,
-                entities=sample_entities,
-                redaction_style=style
-            )
-            
-            assert result.get('redaction_style') == style
-            logger.info(f"✓ Redaction style '{style}' parameter respected")
+        output_path = os.path.join(test_temp_dir, f"redacted_{style}.pdf")
+        
+        result = self.service.redact_document_from_bytes(
+            data=sample_pdf_bytes,
+            file_ext='.pdf',
+            output_path=output_path,
+            entities=sample_entities,
+            redaction_style=style
+        )
+        
+        assert result.get('redaction_style') == style
+        logger.info(f"✓ Redaction style '{style}' parameter respected")
     
-    def test_blur_radius_parameter(self, sample_image_path, sample_entities, test_temp_dir):
+    def test_open_context_multiple_styles(self, sample_pdf_path, sample_entities, test_temp_dir):
+        """Test that one opened document can be redacted in several styles."""
+        results = {}
+        with self.service.open(sample_pdf_path) as ctx:
+            for style in ['black', 'blur', 'white']:
+                output_path = os.path.join(test_temp_dir, f"ctx_{style}.pdf")
+                results[style] = ctx.redact_to(output_path, sample_entities, style)
+                assert os.path.exists(output_path)
+        
+        # Each style starts from the unmarked source
+        assert len({r['redacted_entities'] for r in results.values()}) == 1
+        assert all(results[style]['redaction_style'] == style for style in results)
+        
+        logger.info(f"✓ {len(results)} styles redacted from one open document")
+    
+    def test_open_context_keeps_document_parts(self, sample_entities, test_temp_dir):
+        """Test that context redactions keep the source's metadata, outline and embedded files."""
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "Contact John Doe for details.")
+        doc.set_metadata({"title": "Case file", "author": "Records"})
+        doc.set_toc([[1, "Contact", 1]])
+        doc.embfile_add("notes.txt", b"attached notes")
+        input_path = os.path.join(test_temp_dir, "parts.pdf")
+        doc.save(input_path)
+        doc.close()
+        
+        output_path = os.path.join(test_temp_dir, "parts_redacted.pdf")
+        with self.service.open(input_path) as ctx:
+            ctx.redact_to(output_path, sample_entities)
+        
+        with fitz.open(output_path) as redacted:
+            assert redacted.metadata["title"] == "Case file"
+            assert redacted.metadata["author"] == "Records"
+            assert redacted.get_toc() == [[1, "Contact", 1]]
+            assert redacted.embfile_get("notes.txt") == b"attached notes"
+        
+        logger.info("✓ Metadata, outline and embedded files kept")
+    
+    @pytest.mark.parametrize("radius", [5, 10, 20])
+    def test_blur_radius_parameter(self, radius, sample_image_bytes, sample_entities, test_temp_dir):
         """Test that blur radius parameter is applied."""
-        for radius in [5, 10, 20]:
-            output_path = os.path.join(test_temp_dir, f"redacted_blur_{radius}.png")
-            
-            result = self.service.redact_document(
-                input_path=sample_image_path,
-                output_path=output_path,
-                entities=sample_entities,
-                redaction_style='blur',
-                blur_radius=radius
-            )
-            
-            assert result is not None
-            logger.info(f"✓ Blur radius {radius} applied successfully")
+        output_path = os.path.join(test_temp_dir, f"redacted_blur_{radius}.png")
+        
+        result = self.service.redact_document_from_bytes(
+            data=sample_image_bytes,
+            file_ext='.png',
+            output_path=output_path,
+            entities=sample_entities,
+            redaction_style='blur',
+            blur_radius=radius
+        )
+        
+        assert result is not None
+        logger.info(f"✓ Blur radius {radius} applied successfully")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+"""
+Unit tests for the tests_quick.py runner.
+Tests how runs are chained, without running pytest itself.
+"""
+
+import pytest
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tests_quick
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def runs(monkeypatch, tmp_path):
+    """Record (description, replace) for every run instead of running it."""
+    calls = []
+    exit_codes = {}
+
+    def fake_run_command(cmd, description, isolated=False, replace=False):
+        calls.append((description, replace))
+        return exit_codes.get(description, 0)
+
+    monkeypatch.setattr(tests_quick, "run_command", fake_run_command)
+    # Keep the cache, manifest and coverage data file out of the real tests dir
+    monkeypatch.setattr(tests_quick, "TEST_DIR", tmp_path)
+    monkeypatch.delenv("COVERAGE_FILE", raising=False)
+    monkeypatch.delenv("PYTEST_DISABLE_PLUGIN_AUTOLOAD", raising=False)
+
+    def run(*argv, codes=None):
+        exit_codes.update(codes or {})
+        monkeypatch.setattr(sys, "argv", ["tests_quick.py", *argv])
+        return tests_quick.main()
+
+    run.calls = calls
+    return run
+
+
+def test_sequential_coverage_reports_after_last_suite(runs):
+    """The last suite must not exec while coverage reports still follow it."""
+    exit_code = runs("--unit", "--integration", "--sequential", "--isolated", "--coverage")
+
+    assert exit_code == 0
+    assert [description for description, _ in runs.calls] == [
+        "UNIT TESTS", "INTEGRATION TESTS", "COVERAGE HTML", "COVERAGE REPORT",
+    ]
+    assert not any(replace for _, replace in runs.calls)
+
+
+def test_sequential_last_suite_execs_when_nothing_follows(runs):
+    """Without later runs, the last isolated suite replaces the process."""
+    runs("--unit", "--integration", "--sequential", "--isolated")
+
+    assert runs.calls == [("UNIT TESTS", False), ("INTEGRATION TESTS", True)]
+
+
+def test_collect_cache_no_failures_is_not_an_error(runs):
+    """A suite with no last-run failures (exit code 5) passes and doesn't exec."""
+    exit_code = runs("--unit", "--sequential", "--isolated", "--collect-cache",
+                     codes={"UNIT TESTS": tests_quick.NO_TESTS_COLLECTED})
+
+    assert exit_code == 0
+    assert runs.calls == [("UNIT TESTS", False)]
+
+
+def test_only_first_pytest_run_is_in_process(monkeypatch):
+    """pytest.main runs once per process; later pytest runs become subprocesses."""
+    import pytest as pytest_module
+    in_process, subprocesses = [], []
+    monkeypatch.setattr(tests_quick, "_ran_pytest_in_process", False)
+    monkeypatch.setattr(pytest_module, "main", lambda args: in_process.append(args) or 0)
+    monkeypatch.setattr(tests_quick, "stream_command", lambda cmd: subprocesses.append(cmd) or 0)
+
+    pytest_cmd = [sys.executable, "-m", "pytest", "-q"]
+    tests_quick.run_command(pytest_cmd, "FIRST")
+    tests_quick.run_command(pytest_cmd, "SECOND")
+
+    assert in_process == [["-q"]]
+    assert len(subprocesses) == 1 and subprocesses[0][-1] == "-q"
@@ -4,22 +4,211 @@ Quick test runner script
 Simplifies running different test categories
 """
 
+import os
 import sys
+import json
+import shlex
+import time
+import shutil
+import threading
 import subprocess
 import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def run_command(cmd, description):
-    """Run a command and print status."""
-    print(f"\n{'='*80}")
-    print(f"{description}")
-    print(f"{'='*80}")
-    print(f"Command: {' '.join(cmd)}\n")
+# pytest exit code when the marker selection matches nothing
+NO_TESTS_COLLECTED = 5
+
+SRS_DESCRIPTION = "RUNNING FULL TEST SUITE WITH SRS REPORT GENERATION"
+
+# Read size when copying subprocess output
+STREAM_CHUNK = 64 * 1024
+
+# Test file mtimes as of the last --collect-cache run, kept in the tests dir
+MANIFEST_NAME = ".collect_cache.json"
+
+# Test files per suite; the suite name is also the pytest marker
+SUITES = {
+    "unit": ["test_pii_detection.py", "test_redaction_service.py", "test_tests_quick.py"],
+    "integration": ["test_integration.py"],
+    "performance": ["test_performance.py"],
+}
+
+# This script lives in the tests directory
+TEST_DIR = Path(__file__).resolve().parent
+SUITE_FILES = {
+    suite: [str(TEST_DIR / name) for name in names]
+    for suite, names in SUITES.items()
+}
+
+def print_header(cmd, description):
+    """Print the banner shown before a command's output."""
+    rule = "=" * 80
+    # Quoted, so the command can be pasted back into a shell
+    print(f"\n{rule}\n{description}\n{rule}\nCommand: {shlex.join(cmd)}\n")
+
+# Set once pytest.main has run here; it can't safely run twice in one process
+_ran_pytest_in_process = False
+
+def run_command(cmd, description, isolated=False, replace=False):
+    """
+    Run a command and print status.
+    
+    The first pytest command runs in this process through pytest.main,
+    saving an interpreter start. pytest.main isn't safe to call again
+    (modules and plugins from the first session would carry over), so
+    later pytest commands, other commands, and any command when isolated
+    run as a subprocess. With replace, a command that would run as a
+    subprocess instead replaces this process (exec), so it must be the
+    last thing to run.
+    """
+    global _ran_pytest_in_process
+    in_process = not isolated and not _ran_pytest_in_process and cmd[1:3] == ["-m", "pytest"]
+    if not in_process:
+        cmd = entry_point_cmd(cmd)
+    print_header(cmd, description)
+    start = time.perf_counter()
     
-    result = subprocess.run(cmd)
-    return result.returncode
+    if in_process:
+        import pytest
+        _ran_pytest_in_process = True
+        try:
+            exit_code = int(pytest.main(cmd[3:]))
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+    else:
+        if replace:
+            sys.stdout.flush()
+            os.execvp(cmd[0], cmd)
+        exit_code = stream_command(cmd)
+    
+    print(f"\n{description} finished in {time.perf_counter() - start:.2f}s")
+    return exit_code
+
+def report_skipped(descriptions):
+    """Name the runs a failure stopped, so the log still lists every run."""
+    for description in descriptions:
+        print(f"{description}: skipped due to earlier failure")
+
+def stream_command(cmd):
+    """
+    Run a command as a subprocess, copying its output to ours in large
+    chunks through a pipe rather than letting it write to the terminal.
+    """
+    env = os.environ.copy()
+    if sys.stdout.isatty():
+        # pytest only colors a terminal; keep the colors through the pipe
+        env["PYTEST_ADDOPTS"] = f"{env.get('PYTEST_ADDOPTS', '')} --color=yes".strip()
+    
+    sys.stdout.flush()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            bufsize=STREAM_CHUNK, env=env)
+    with proc.stdout:
+        fd = proc.stdout.fileno()
+        while chunk := os.read(fd, STREAM_CHUNK):
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+    return proc.wait()
+
+def find_pytest_exe():
+    """
+    The pytest script of the running interpreter's environment, or None.
+    
+    Anything on PATH outside sys.prefix (another venv, a pyenv shim) may
+    run a different interpreter, so it isn't used.
+    """
+    exe = shutil.which("pytest")
+    if exe and Path(sys.prefix).resolve() in Path(exe).resolve().parents:
+        return exe
+    return None
+
+PYTEST_EXE = find_pytest_exe()
+
+def entry_point_cmd(cmd):
+    """Run a `python -m pytest` command through the pytest script when there is one."""
+    if PYTEST_EXE and cmd[1:3] == ["-m", "pytest"]:
+        return [PYTEST_EXE] + cmd[3:]
+    return cmd
+
+def run_commands_concurrently(jobs):
+    """
+    Run (cmd, description) jobs as concurrent subprocesses.
+    
+    Each job's output is captured and printed under its banner as the job
+    finishes, so blocks don't interleave. The threads only wait on their
+    subprocess; pytest never runs in this process. Returns the worst exit
+    code.
+    """
+    def run(cmd):
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    
+    codes = []
+    # Threads rather than a ProcessPoolExecutor: each worker just blocks on its subprocess
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        jobs = [(entry_point_cmd(cmd), description) for cmd, description in jobs]
+        futures = {executor.submit(run, cmd): (cmd, description) for cmd, description in jobs}
+        for future in as_completed(futures):
+            result = future.result()
+            print_header(*futures[future])
+            print(result.stdout, end="")
+            codes.append(result.returncode)
+    return max(codes, default=0)
+
+# Built-in plugins a quick run never needs
+QUICK_DISABLE = ["cacheprovider", "doctest", "nose", "pastebin", "warnings", "junitxml"]
+
+# With plugin autoloading off (--quick), third-party plugins load only when asked
+PLUGIN_MODULES = {
+    "asyncio": "pytest_asyncio.plugin",
+    "benchmark": "pytest_benchmark.plugin",
+    "cov": "pytest_cov.plugin",
+    "xdist": "xdist.plugin",
+}
+
+def plugin_args(*names):
+    """-p arguments loading the named plugins, skipping any not installed."""
+    args = []
+    for name in names:
+        module = PLUGIN_MODULES[name]
+        if importlib.util.find_spec(module.split(".")[0]):
+            args += ["-p", module]
+    return args
+
+def manifest_files(test_dir):
+    """Files whose changes can change what pytest collects."""
+    files = sorted(test_dir.glob("*.py"))
+    for name in ("pytest.ini", "pyproject.toml"):
+        if (test_dir.parent / name).exists():
+            files.append(test_dir.parent / name)
+    return files
+
+def current_manifest(test_dir):
+    """{path: mtime in ns} for every file in manifest_files."""
+    return {str(path): path.stat().st_mtime_ns for path in manifest_files(test_dir)}
+
+def read_manifest(path):
+    """The stored manifest, or None if there isn't a readable one."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(path, manifest):
+    path.write_text(json.dumps(manifest, indent=2))
+
+def suite_paths(suites):
+    """Test file paths for the given suites, in suite order."""
+    return [path for suite in suites for path in SUITE_FILES[suite]]
 
 def main():
+    # Import pytest in the background while arguments and commands are set
+    # up; the in-process run then finds it already loaded
+    prewarm = None
+    if "--no-prewarm" not in sys.argv[1:]:
+        prewarm = threading.Thread(target=lambda: __import__("pytest"), daemon=True)
+        prewarm.start()
+    
     parser = argparse.ArgumentParser(
         description="Run PII Redactor tests",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -29,8 +218,14 @@ Examples:
   python tests_quick.py --integration   # Run integration tests
   python tests_quick.py --performance   # Run performance tests
   python tests_quick.py --all           # Run all tests
+  python tests_quick.py --all --jobs 4  # Run all tests on 4 xdist workers
+  python tests_quick.py --all --sequential  # One pytest run per suite
+  python tests_quick.py --all --parallel-suites  # One pytest run per suite, all at once
   python tests_quick.py --quick         # Quick test run
+  python tests_quick.py --all --fail-fast   # Stop at the first failing test
   python tests_quick.py --coverage      # With coverage report
+  python tests_quick.py --unit --changed    # Re-run what failed last time
+  python tests_quick.py --unit --collect-cache  # Failures only, if no test file changed
         """
     )
     
@@ -38,75 +233,208 @@ Examples:
     parser.add_argument('--integration', action='store_true', help='Run integration tests only')
     parser.add_argument('--performance', action='store_true', help='Run performance tests only')
     parser.add_argument('--all', action='store_true', help='Run all test suites')
+    parser.add_argument('--jobs', default='auto', help='xdist workers (default: auto)')
+    parser.add_argument('--sequential', action='store_true',
+                        help='Run each selected suite as a separate pytest run, without xdist')
+    parser.add_argument('--parallel-suites', action='store_true',
+                        help='Run each selected suite as a separate pytest process, concurrently')
     parser.add_argument('--quick', action='store_true', help='Quick test run (excludes slow tests)')
+    parser.add_argument('--fail-fast', action='store_true',
+                        help='Stop each pytest run at its first failure (always on with --quick)')
     parser.add_argument('--coverage', action='store_true', help='Run with coverage report')
     parser.add_argument('--srs', action='store_true', help='Run full suite and generate SRS report')
+    parser.add_argument('--changed', action='store_true',
+                        help='Run last-failed tests first-and-only, then new test files (--lf --nf)')
+    parser.add_argument('--cached', action='store_true',
+                        help="Keep the cache's d/ artifacts from earlier runs instead of purging them")
+    parser.add_argument('--collect-cache', action='store_true',
+                        help='If no test file changed since the last such run, rerun only its failures')
+    parser.add_argument('--isolated', action='store_true',
+                        help='Run each pytest invocation in its own subprocess')
+    parser.add_argument('--no-exec', action='store_true',
+                        help="Always return to this script after the last run instead of exec'ing it")
+    parser.add_argument('--no-prewarm', action='store_true',
+                        help='Import pytest only when a run starts (for debugging import errors)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
+    if args.parallel_suites and args.coverage:
+        # Concurrent runs would all write the same .coverage data file
+        parser.error("--parallel-suites can't be combined with --coverage")
     
     # Default to all tests if no option specified
     if not any([args.unit, args.integration, args.performance, args.all, args.quick, args.coverage, args.srs]):
         args.all = True
     
-    test_dir = Path(__file__).parent / "tests"
-    
     # Build base command
     base_cmd = [sys.executable, "-m", "pytest"]
     if args.verbose:
         base_cmd.append("-vv")
     else:
-        base_cmd.append("-v")
+        # A line per test is a lot of terminal output; ask for it with -v
+        base_cmd.append("-q")
+    
+    # Keep collection inside the tests package: no walking the rest of the
+    # tree for conftests, and test modules imported directly rather than
+    # via sys.path manipulation. Project-level conftests therefore have to
+    # live in backend/tests/
+    base_cmd += [
+        "--rootdir", str(TEST_DIR),
+        "--confcutdir", str(TEST_DIR),
+        "--import-mode=importlib",
+        # importlib mode doesn't touch sys.path, so make the app importable
+        "-o", f"pythonpath={TEST_DIR.parent}",
+    ]
+    
+    # One cache location whatever the working directory, so --changed sees
+    # the failures of every earlier run, local or CI
+    cache_dir = TEST_DIR / ".pytest_cache"
+    base_cmd += ["-o", f"cache_dir={cache_dir}"]
+    if not args.cached:
+        # d/ holds plugin artifacts that can go stale; lastfailed (v/) stays
+        shutil.rmtree(cache_dir / "d", ignore_errors=True)
+    if args.quick or args.fail_fast:
+        base_cmd.append("-x")
+    
+    if args.changed:
+        base_cmd += ["--lf", "--nf"]
+    elif args.collect_cache:
+        # Unchanged test files since the last run: only its failures can
+        # have a different outcome. --lf also skips collecting the modules
+        # that had none, and with no failures at all nothing runs
+        manifest_path = TEST_DIR / MANIFEST_NAME
+        manifest = current_manifest(TEST_DIR)
+        if read_manifest(manifest_path) == manifest:
+            base_cmd += ["--lf", "--last-failed-no-failures=none"]
+        # Written now rather than at exit, since the last run may exec
+        write_manifest(manifest_path, manifest)
+    
+    # Suites to run, by marker; each test file tags its tests with its suite
+    selected = [
+        suite for suite in SUITES
+        if getattr(args, suite) or args.all or (suite == "unit" and args.quick)
+    ]
+    if args.coverage and not selected:
+        selected = list(SUITES)
+    
+    # Quick runs skip plugin autoloading and load only what this run uses.
+    # --changed and --collect-cache still need the cache for last-failed data
+    if args.quick:
+        os.environ["PYTEST_DISABLE_PLUGIN_AUTOLOAD"] = "1"
+        for name in QUICK_DISABLE:
+            if not ((args.changed or args.collect_cache) and name == "cacheprovider"):
+                base_cmd += ["-p", f"no:{name}"]
+        needed = ["asyncio"]
+        if "performance" in selected:
+            needed.append("benchmark")
+        if args.coverage:
+            needed.append("cov")
+        base_cmd += plugin_args(*needed)
+    
+    # Slow tests are skipped unless asked for; only --quick leaves them out
+    if args.quick:
+        extra_args = ["--tb=line", "--no-header"]
+    else:
+        extra_args = ["--tb=short", "--run-slow"]
+    if args.coverage:
+        # Every run appends to one data file; the report is built once at the end
+        os.environ["COVERAGE_FILE"] = str(TEST_DIR / ".coverage")
+        Path(os.environ["COVERAGE_FILE"]).unlink(missing_ok=True)
+        extra_args += ["--cov=app", "--cov-append", "--cov-report="]
+    
+    if prewarm:
+        prewarm.join()
     
     exit_code = 0
+    # Runs that follow the test runs
+    final_runs = (["COVERAGE HTML", "COVERAGE REPORT"] if args.coverage else []) + \
+        ([SRS_DESCRIPTION] if args.srs else [])
     
-    # Unit tests
-    if args.unit or args.all or args.quick:
-        cmd = base_cmd + [
-            str(test_dir / "test_pii_detection.py"),
-            str(test_dir / "test_redaction_service.py"),
-            "--tb=short"
+    if len(selected) > 1 and args.parallel_suites:
+        # Suites are independent, so run them side by side and report every
+        # suite rather than stopping at the first failure
+        jobs = [
+            (base_cmd + suite_paths([suite]) + ["-m", suite] + extra_args,
+             f"{suite.upper()} TESTS")
+            for suite in selected
         ]
-        exit_code = run_command(cmd, "UNIT TESTS")
+        exit_code = run_commands_concurrently(jobs)
         if exit_code != 0:
+            report_skipped(final_runs)
             return exit_code
     
-    # Integration tests
-    if args.integration or args.all:
-        cmd = base_cmd + [
-            str(test_dir / "test_integration.py"),
-            "--tb=short"
-        ]
-        exit_code = run_command(cmd, "INTEGRATION TESTS")
-        if exit_code != 0:
-            return exit_code
+    elif selected and (args.sequential or args.parallel_suites):
+        for suite in selected:
+            cmd = base_cmd + suite_paths([suite]) + ["-m", suite] + extra_args
+            # Once nothing follows the last suite, a subprocess can take
+            # over; not with --collect-cache, whose exit code is remapped below
+            last = suite == selected[-1] and not final_runs
+            exit_code = run_command(cmd, f"{suite.upper()} TESTS", args.isolated,
+                                    replace=last and not args.collect_cache and not args.no_exec)
+            if exit_code == NO_TESTS_COLLECTED and args.collect_cache:
+                # No last-run failures in this suite
+                exit_code = 0
+            if exit_code != 0:
+                remaining = selected[selected.index(suite) + 1:]
+                report_skipped([f"{later.upper()} TESTS" for later in remaining] + final_runs)
+                return exit_code
     
-    # Performance tests
-    if args.performance or args.all:
-        cmd = base_cmd + [
-            str(test_dir / "test_performance.py"),
-            "--tb=short"
-        ]
-        if args.quick:
-            cmd.append("-m 'not slow'")
-        exit_code = run_command(cmd, "PERFORMANCE TESTS")
+    elif selected:
+        # One session for every selected suite, spread over xdist workers;
+        # timing-sensitive (serial) tests then run on their own so workers
+        # don't skew them
+        paths = suite_paths(selected)
+        marker_expr = " or ".join(selected)
+        label = "ALL" if len(selected) == len(SUITES) else " + ".join(suite.upper() for suite in selected)
+        
+        cmd = base_cmd + paths + ["-m", f"({marker_expr}) and not serial"] + extra_args
+        if importlib.util.find_spec("xdist"):
+            if args.quick:
+                cmd += plugin_args("xdist")
+            cmd += ["-n", args.jobs, "--dist=loadfile"]
+        else:
+            print("pytest-xdist not installed, running without parallel workers")
+        exit_code = run_command(cmd, f"{label} TESTS", args.isolated)
+        if exit_code not in (0, NO_TESTS_COLLECTED):
+            report_skipped([f"{label} TESTS (SERIAL)"] + final_runs)
+            return exit_code
+        
+        # Performance tests are all serial and are deliberately not sharded
+        # over workers: they time themselves, and every worker would load
+        # its own copy of the session pii_service models
+        cmd = base_cmd + paths + ["-m", f"({marker_expr}) and serial", "-p", "no:xdist"] + extra_args
+        exit_code = run_command(cmd, f"{label} TESTS (SERIAL)", args.isolated)
+        if exit_code == NO_TESTS_COLLECTED:
+            exit_code = 0
         if exit_code != 0:
+            report_skipped(final_runs)
             return exit_code
     
-    # Coverage
     if args.coverage:
-        cmd = base_cmd + [
-            str(test_dir),
-            "--cov=app",
-            "--cov-report=html",
-            "--cov-report=term"
-        ]
-        exit_code = run_command(cmd, "TESTS WITH COVERAGE REPORT")
+        for report in ("html", "report"):
+            exit_code = run_command([sys.executable, "-m", "coverage", report], f"COVERAGE {report.upper()}")
+            if exit_code != 0:
+                report_skipped(final_runs[final_runs.index(f"COVERAGE {report.upper()}") + 1:])
+                return exit_code
+    
+    # run_tests.py relies on autoloaded plugins (pytest-html)
+    os.environ.pop("PYTEST_DISABLE_PLUGIN_AUTOLOAD", None)
     
     # SRS Report
     if args.srs:
-        cmd = [sys.executable, str(test_dir / "run_tests.py")]
-        exit_code = run_command(cmd, "RUNNING FULL TEST SUITE WITH SRS REPORT GENERATION")
+        cmd = [sys.executable, str(TEST_DIR / "run_tests.py")]
+        # run_tests.main calls pytest.main, so it only runs here if no
+        # pytest session has yet
+        if args.isolated or _ran_pytest_in_process:
+            exit_code = run_command(cmd, SRS_DESCRIPTION, isolated=True, replace=not args.no_exec)
+        else:
+            # run_tests.py sits next to this script, so it's importable as is
+            print_header(cmd, SRS_DESCRIPTION)
+            import run_tests
+            try:
+                exit_code = run_tests.main()
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
     
     print(f"\n{'='*80}")
     print(f"Test run completed with exit code: {exit_code}")